@@ -77,6 +77,14 @@ expected ways:
             floor(x/y) as if x/y were computed to infinite precision,
             and r is a FixedPoint equal to x - q * y; no information
             is lost.  Note that q has the sign of y, and abs(r) < abs(y).
+    augmented += -= *= /=
+        update the FixedPoint in place rather than binding a new
+        object, so every other reference to it sees the change: after
+        b = a; b += 1, a has changed too.  Don't use them on a
+        FixedPoint that is a dict key or set member, since its hash
+        changes with its value; copy() it first, or use a
+        FrozenFixedPoint, or a subclass with inplace = 0, which keep
+        the usual value semantics.
     unary -
     == != < > <= >=  cmp
     min  max
@@ -84,14 +92,143 @@ expected ways:
     abs
     str  repr
     hash
-    use as dict keys
+    use as dict keys (but see augmented assignment above)
     use as boolean (e.g. "if some_FixedPoint:" -- true iff not zero)
 
 Methods unique to FixedPoints:
+   .allocate(weights)   split into parts proportional to weights
    .copy()              return new FixedPoint with same value
+   .divisor(d)          (classmethod) return a Divisor dividing values by d
+   .from_floats(floats, p)  (classmethod) convert a column of floats at once
+   .from_scaled(n, p)   (classmethod) return new FixedPoint equal to n/10**p
    .frac()              long(x) + x.frac() == x
    .get_precision()     return the precision(p) of this FixedPoint object
+   .normalize()         return equal FixedPoint with smallest exact precision
+   .parse_many(strings, p)  (classmethod) parse a column of strings at once
+   .quantize(p, rounding)   return a copy rounded to precision p
    .set_precision(p)    set the precision of this FixedPoint object
+   .sort_key()          return a sort key valid across precisions
+   .with_rounding(mode) (classmethod) return a subclass rounding by mode
+
+fixed_class(p, rounding) returns a FixedPoint subclass whose instances
+all carry precision p; arithmetic between two instances of such a class
+skips precision alignment.
+
+>>> Money = fixed_class(2, name="Money")
+>>> print Money("19.99") * 3 + Money("0.025")  # 0.025 rounds to 0.02
+59.99
+>>> Money("1.5")
+Money('1.50')
+>>>
+
+Rounding is done by the class's round method.  Besides bankersRounding
+(ROUND_HALF_EVEN, the default) and addHalfAndChop (ROUND_HALF_UP) there
+are ROUND_FLOOR, ROUND_CEILING, ROUND_DOWN, ROUND_UP, ROUND_HALF_DOWN and
+ROUND_05UP, each with a vectorized form for FixedPointArray operations;
+register_rounding() adds more.  A mode can be chosen per class, with
+with_rounding() or fixed_class(), or per call, with quantize().
+
+>>> Floor = FixedPoint.with_rounding(ROUND_FLOOR)
+>>> print Floor("-1.005"), FixedPoint("2.675", 3).quantize(2, ROUND_UP)
+-1.01 2.68
+>>>
+
+FrozenFixedPoint is an immutable FixedPoint: set_precision raises
+TypeError, and its hash is computed once and cached.
+
+FixedPointArray objects hold a column of values sharing one precision,
+stored as a single buffer of scaled integers.  Binary + - * / % divmod
+work elementwise against another FixedPointArray of the same length or
+against a scalar, with the same precision promotion and rounding as
+FixedPoint; comparisons return a list of bools.
+
+>>> a = FixedPointArray(["1.25", "2.50", "-3"])
+>>> print a * 3
+FixedPointArray(['3.75', '7.50', '-9.00'], 2)
+>>> print a.sum()
+0.75
+>>>
+
+FixedPoint.divisor(d) returns a Divisor, which divides any number of
+FixedPoints or FixedPointArrays by d with the rounding of x / d, working
+out the scaling of d only once per precision.
+
+>>> rate = FixedPoint.divisor(FixedPoint("1.0825", 4))
+>>> print rate.divide(FixedPoint("100.00"))
+92.3788
+>>> print rate.divide(a)
+FixedPointArray(['1.1547', '2.3095', '-2.7714'], 4)
+>>>
+
+sumprod(rows) and dot(xs, ys) return sums of products computed exactly
+and rounded once at the end, independent of the order of the terms.
+
+>>> qty = [3, 7, 2]
+>>> price = [FixedPoint("19.99"), FixedPoint("0.35"), FixedPoint("5.125", 3)]
+>>> print dot(qty, price, 2)
+72.67
+>>> print sumprod([(3, "0.25", FixedPoint("1.10")), (1, FixedPoint("2.5"))])
+3.32
+>>>
+
+An Accumulator sums FixedPoints, ints and numeric strings of any
+precision exactly, without creating intermediate FixedPoints.
+
+>>> acc = Accumulator([FixedPoint("1.25"), 3, "0.005"])
+>>> acc.add(FixedPoint("-0.5", 1))
+Accumulator(FixedPoint('3.755', 3))
+>>> print acc.value(2)
+3.76
+>>>
+
+Stats(values) computes the mean, variance, standard deviation, min, max
+and quantiles of FixedPoints of any precisions in one pass, from exact
+integer sums, rounding each result once.
+
+>>> st = Stats(["1.5", "2.25", 3])
+>>> print st.mean(), st.stdev(), st.median()
+2.25 0.75 2.25
+>>>
+
+quantize_to_increment(x, increment) rounds a FixedPoint or a
+FixedPointArray to a multiple of a tick size, and frange(start, stop,
+step) generates an exact ladder of prices.
+
+>>> print quantize_to_increment(FixedPoint("101.37"), "0.05")
+101.35
+>>> print [str(x) for x in frange("99.5", 100, "0.25")]
+['99.50', '99.75']
+>>>
+
+x.allocate(weights) splits x into parts proportional to weights that
+sum exactly to x, giving leftover units to the largest remainders;
+allocate_many(amounts, weights) splits many amounts the same way.
+
+>>> [str(x) for x in FixedPoint("100.00").allocate([1, 1, 1])]
+['33.34', '33.33', '33.33']
+>>>
+
+format_many(values) renders many FixedPoints into a single string, with
+optional thousands separators, decimal point and field width.
+
+>>> print format_many([FixedPoint("1234567.891"), FixedPoint(-5, 0)],
+...                   sep="|", thousands=",", width=14)
+  1,234,567.89|           -5.
+>>>
+
+getcontext() returns the current thread's FixedPointContext, holding the
+default precision for new FixedPoints, a rounding that overrides every
+class's round method, and a max_precision that limits the precision of
+arithmetic results.  localcontext() changes them for a with statement.
+
+>>> with localcontext(precision=4, rounding=ROUND_FLOOR, max_precision=4):
+...     print FixedPoint(1) / 3, FixedPoint("-0.0123", 5) / 2
+0.3333 -0.0062
+>>>
+
+read_csv(source, {column: precision}) generates the rows of a CSV file
+in chunks with the named columns converted to FixedPoint, and
+write_csv(dest, rows) writes rows containing FixedPoints back out.
    
 Provided as-is; use at your own risk; no warranty; no promises; enjoy!
 """
@@ -129,6 +266,8 @@ def bankersRounding(self, dividend, divisor, quotient, remainder):
          the remainder is more than half of the divisor
       or the remainder is exactly half the divisor and the quotient is odd
     """
+    if not remainder:
+        return quotient
     c = cmp(remainder << 1, divisor)
     # c < 0 <-> remainder < divisor/2, etc
     if c > 0 or (c == 0 and (quotient & 1) == 1):
@@ -142,12 +281,161 @@ def addHalfAndChop(self, dividend, divisor, quotient, remainder):
          the remainder is greater than half of the divisor
       or the remainder is exactly half the divisor and the quotient is >= 0
     """
+    if not remainder:
+        return quotient
     c = cmp(remainder << 1, divisor)
     # c < 0 <-> remainder < divisor/2, etc
     if c > 0 or (c == 0 and quotient >= 0):
         quotient += 1
     return quotient
 
+# More rounding functions.  All take the floor quotient and remainder of
+# dividend / divisor with divisor > 0, so quotient < 0 exactly when the
+# dividend is negative.
+
+def roundFloor(self, dividend, divisor, quotient, remainder):
+    """round toward -infinity"""
+    return quotient
+
+def roundCeiling(self, dividend, divisor, quotient, remainder):
+    """round toward +infinity"""
+    if remainder:
+        quotient += 1
+    return quotient
+
+def roundDown(self, dividend, divisor, quotient, remainder):
+    """round toward zero"""
+    if remainder and quotient < 0:
+        quotient += 1
+    return quotient
+
+def roundUp(self, dividend, divisor, quotient, remainder):
+    """round away from zero"""
+    if remainder and quotient >= 0:
+        quotient += 1
+    return quotient
+
+def roundHalfDown(self, dividend, divisor, quotient, remainder):
+    """round to nearest, ties toward zero"""
+    if not remainder:
+        return quotient
+    c = cmp(remainder << 1, divisor)
+    if c > 0 or (c == 0 and quotient < 0):
+        quotient += 1
+    return quotient
+
+def round05Up(self, dividend, divisor, quotient, remainder):
+    """round toward zero, unless that leaves a last digit of 0 or 5,
+       in which case round away from zero"""
+    if not remainder:
+        return quotient
+    if quotient < 0:
+        quotient += 1
+    if abs(quotient) % 5 == 0:
+        if dividend < 0:
+            quotient -= 1
+        else:
+            quotient += 1
+    return quotient
+
+# Vectorized forms: return the rounded ns[i] / divisor for divisor > 0,
+# with the per-element work inlined or done in closed form.
+
+def _vfloor(ns, d):
+    return [n // d for n in ns]
+
+def _vceiling(ns, d):
+    return [-(-n // d) for n in ns]
+
+def _vdown(ns, d):
+    return [n // d if n >= 0 else -(-n // d) for n in ns]
+
+def _vup(ns, d):
+    return [-(-n // d) if n >= 0 else n // d for n in ns]
+
+def _vhalfup(ns, d):
+    # |n|/d + 1/2, chopped
+    d2 = d << 1
+    return [((n << 1) + d) // d2 if n >= 0 else -((d - (n << 1)) // d2)
+            for n in ns]
+
+def _vhalfdown(ns, d):
+    # |n|/d - 1/2, rounded up
+    d2 = d << 1
+    return [-((d - (n << 1)) // d2) if n >= 0 else ((n << 1) + d) // d2
+            for n in ns]
+
+def _vhalfeven(ns, d):
+    result = []
+    append = result.append
+    for n in ns:
+        q, r = divmod(n, d)
+        if r:
+            c = cmp(r << 1, d)
+            if c > 0 or (c == 0 and q & 1):
+                q += 1
+        append(q)
+    return result
+
+def _v05up(ns, d):
+    result = []
+    append = result.append
+    for n in ns:
+        q, r = divmod(n, d)
+        if r:
+            if q < 0:
+                q += 1
+            if abs(q) % 5 == 0:
+                q = n < 0 and q - 1 or q + 1
+        append(q)
+    return result
+
+# Rounding modes, named as in the decimal module.  register_rounding()
+# adds more; anywhere a rounding function is accepted, a mode name may be
+# given instead.
+
+ROUND_FLOOR = "ROUND_FLOOR"
+ROUND_CEILING = "ROUND_CEILING"
+ROUND_DOWN = "ROUND_DOWN"
+ROUND_UP = "ROUND_UP"
+ROUND_HALF_UP = "ROUND_HALF_UP"
+ROUND_HALF_DOWN = "ROUND_HALF_DOWN"
+ROUND_HALF_EVEN = "ROUND_HALF_EVEN"
+ROUND_05UP = "ROUND_05UP"
+
+_roundings = {}         # mode name -> rounding function
+_vroundings = {}        # rounding function -> vectorized form
+
+def register_rounding(mode, rounding, vectorized=None):
+    """Register rounding function rounding under the name mode.
+
+        rounding has the signature of bankersRounding.  vectorized, if
+        given, takes a list of dividends and a divisor > 0 and returns
+        the list of rounded quotients; array operations use it.
+    """
+    _roundings[mode] = rounding
+    if vectorized is not None:
+        _vroundings[rounding] = vectorized
+
+def get_rounding(rounding):
+    """Return the rounding function for a mode name, or rounding itself
+       if it is already a function."""
+    if callable(rounding):
+        return rounding
+    try:
+        return _roundings[rounding]
+    except (KeyError, TypeError):
+        raise ValueError("unknown rounding mode: " + `rounding`)
+
+register_rounding(ROUND_FLOOR, roundFloor, _vfloor)
+register_rounding(ROUND_CEILING, roundCeiling, _vceiling)
+register_rounding(ROUND_DOWN, roundDown, _vdown)
+register_rounding(ROUND_UP, roundUp, _vup)
+register_rounding(ROUND_HALF_UP, addHalfAndChop, _vhalfup)
+register_rounding(ROUND_HALF_DOWN, roundHalfDown, _vhalfdown)
+register_rounding(ROUND_HALF_EVEN, bankersRounding, _vhalfeven)
+register_rounding(ROUND_05UP, round05Up, _v05up)
+
 # 2002-10-20 dougfort - fake classes for pre 2.2 compatibility
 try:
     object
@@ -158,74 +446,192 @@ except NameError:
         return None
 
 # The default value for the number of decimal digits carried after the
-# decimal point.  This only has effect at compile-time.
+# decimal point.  Each thread's context starts with this precision; see
+# FixedPointContext.
 DEFAULT_PRECISION = 2
 
+# Operands of these types take the exact integer fast paths in the
+# arithmetic operators instead of being converted via _norm.
+_inttypes = (type(42), type(42L))
+
+def _checkprecision(precision):
+    """Return precision as an int, raising TypeError or ValueError if it
+       is not a valid precision.  None means the default precision of
+       the current context."""
+    if precision is None:
+        if _contextused:
+            return _current().precision
+        return DEFAULT_PRECISION
+    try:
+        p = int(precision)
+    except:
+        raise TypeError("precision not convertable to int: " +
+                        `precision`)
+    if p < 0:
+        raise ValueError("precision must be >= 0: " + `precision`)
+    return p
+
+# Arithmetic contexts, in the manner of the decimal module: per-thread
+# settings for the default precision, a rounding that overrides the
+# classes' own, and a cap on the precision of arithmetic results.  Until
+# getcontext(), setcontext() or localcontext() is first called the hot
+# paths only test the _contextused flag and use the module defaults.
+
+try:
+    import threading as _threading
+except ImportError:
+    import dummy_threading as _threading
+
+_contextused = 0
+_tls = _threading.local()
+
+class FixedPointContext(object):
+    """Arithmetic settings for the current thread.
+
+        precision is given to new FixedPoints (and arrays) whose
+        constructor, set_precision or from_scaled gets no precision;
+        it defaults to DEFAULT_PRECISION.  rounding, a rounding function
+        or mode name, replaces the round method of every class when not
+        None.  max_precision, when not None, caps the precision of the
+        results of + - * / on FixedPoints and FixedPointArrays, of
+        Divisor.divide, and of the default precision of sumprod, dot,
+        Accumulator.value and Stats: they are rounded to it.  Classes
+        from fixed_class keep their precision, divmod and % stay exact,
+        and an explicit precision argument is used as given.
+    """
+    __slots__ = ['precision', 'rounding', 'max_precision']
+
+    def __init__(self, precision=None, rounding=None, max_precision=None):
+        if precision is None:
+            precision = DEFAULT_PRECISION
+        self.precision = _checkprecision(precision)
+        if rounding is not None:
+            rounding = get_rounding(rounding)
+        self.rounding = rounding
+        if max_precision is not None:
+            max_precision = _checkprecision(max_precision)
+        self.max_precision = max_precision
+
+    def copy(self):
+        return FixedPointContext(self.precision, self.rounding,
+                                 self.max_precision)
+
+    def __repr__(self):
+        rounding = self.rounding
+        if rounding is not None:
+            rounding = rounding.__name__
+        return "FixedPointContext(precision=%r, rounding=%s, " \
+               "max_precision=%r)" % (self.precision, rounding,
+                                      self.max_precision)
+
+def _current():
+    """Return the current thread's context, creating it if needed."""
+    try:
+        return _tls.context
+    except AttributeError:
+        context = _tls.context = FixedPointContext()
+        return context
+
+def getcontext():
+    """Return the current thread's context; changes to it take effect
+       at once."""
+    global _contextused
+    _contextused = 1
+    return _current()
+
+def setcontext(context):
+    """Make context the current thread's context."""
+    global _contextused
+    _contextused = 1
+    _tls.context = context
+
+class _ContextManager(object):
+    """Install a context for the duration of a with statement."""
+
+    def __init__(self, context):
+        self.context = context
+
+    def __enter__(self):
+        self.saved = _current()
+        setcontext(self.context)
+        return self.context
+
+    def __exit__(self, *exc_info):
+        setcontext(self.saved)
+
+def localcontext(context=None, **settings):
+    """Return a context manager that makes a copy of context (default:
+       the current one), updated by the keyword arguments precision,
+       rounding and max_precision, current inside a with statement.
+
+       with localcontext(precision=4, rounding=ROUND_FLOOR):
+           ...
+    """
+    if context is None:
+        context = _current()
+    values = {"precision": context.precision,
+              "rounding": context.rounding,
+              "max_precision": context.max_precision}
+    for name in settings:
+        if name not in values:
+            raise TypeError("unknown context setting: " + name)
+    values.update(settings)
+    return _ContextManager(FixedPointContext(**values))
+
+def _roundingof(cls):
+    """Return the rounding cls uses in the current context."""
+    if _contextused:
+        rounding = _current().rounding
+        if rounding is not None:
+            return rounding
+    return cls.round
+
+def _maxp(p, cls):
+    """Return the precision of an arithmetic result computed at p: p,
+       or the context's max_precision if smaller."""
+    m = _current().max_precision
+    if m is None or p <= m or hasattr(cls, "PRECISION"):
+        return p
+    return m
+
+def _capped(self, n, p):
+    """Return n / 10**p as a type(self), rounded to _maxp(p)."""
+    cls = type(self)
+    t = _maxp(p, cls)
+    if t < p:
+        n = self._roundquotient(n, _tento(p - t))
+    return _mkFP(n, t, cls)
+
 class FixedPoint(object):
     """Basic FixedPoint object class,
         The exact value is self.n / 10**self.p;
         self.n is a long; self.p is an int
     """
     __slots__ = ['n', 'p']
-    def __init__(self, value=0, precision=DEFAULT_PRECISION):
-        self.n = self.p = 0
-        self.set_precision(precision)
-        p = self.p
+    def __init__(self, value=0, precision=None):
+        self.n = 0L
+        self.p = p = _checkprecision(precision)
 
         if isinstance(value, type("42.3e5")):
-            n, exp = _string2exact(value)
-            # exact value is n*10**exp = n*10**(exp+p)/10**p
-            effective_exp = exp + p
-            if effective_exp > 0:
-                n = n * _tento(effective_exp)
-            elif effective_exp < 0:
-                n = self._roundquotient(n, _tento(-effective_exp))
-            self.n = n
+            self.n = _cachedscaled(self, value, p, _string2scaled)
             return
 
         if isinstance(value, type(42)) or isinstance(value, type(42L)):
             self.n = long(value) * _tento(p)
             return
 
-        if isinstance(value, type(self)):
-            temp = value.copy()
-            temp.set_precision(p)
-            self.n, self.p = temp.n, temp.p
+        if isinstance(value, FixedPoint):
+            # rescale directly, rounding (if needed) the way self rounds
+            n, vp = value.n, value.p
+            if vp < p:
+                n = n * _tento(p - vp)
+            elif vp > p:
+                n = self._roundquotient(n, _tento(vp - p))
+            self.n = n
             return
 
         if isinstance(value, type(42.0)):
-            # XXX ignoring infinities and NaNs and overflows for now
-            import math
-            f, e = math.frexp(abs(value))
-            assert f == 0 or 0.5 <= f < 1.0
-            # |value| = f * 2**e exactly
-
-            # Suck up CHUNK bits at a time; 28 is enough so that we suck
-            # up all bits in 2 iterations for all known binary double-
-            # precision formats, and small enough to fit in an int.
-            CHUNK = 28
-            top = 0L
-            # invariant: |value| = (top + f) * 2**e exactly
-            while f:
-                f = math.ldexp(f, CHUNK)
-                digit = int(f)
-                assert digit >> CHUNK == 0
-                top = (top << CHUNK) | digit
-                f = f - digit
-                assert 0.0 <= f < 1.0
-                e = e - CHUNK
-
-            # now |value| = top * 2**e exactly
-            # want n such that n / 10**p = top * 2**e, or
-            # n = top * 10**p * 2**e
-            top = top * _tento(p)
-            if e >= 0:
-                n = top << e
-            else:
-                n = self._roundquotient(top, 1L << -e)
-            if value < 0:
-                n = -n
-            self.n = n
+            self.n = _cachedscaled(self, value, p, _float2scaled)
             return
 
         if isinstance(value, type(42-42j)):
@@ -239,7 +645,7 @@ class FixedPoint(object):
         except:
             yes = 0
         if yes:
-            self.__init__(asfloat, p)
+            FixedPoint.__init__(self, asfloat, p)
             return
 
         # similarly for long
@@ -249,7 +655,7 @@ class FixedPoint(object):
         except:
             yes = 0
         if yes:
-            self.__init__(aslong, p)
+            FixedPoint.__init__(self, aslong, p)
             return
 
         raise TypeError("can't convert to FixedPoint: " + `value`)
@@ -263,23 +669,17 @@ class FixedPoint(object):
 
         return self.p
 
-    def set_precision(self, precision=DEFAULT_PRECISION):
+    def set_precision(self, precision=None):
         """Change the precision carried by this FixedPoint to p.
 
-           precision must be an int >= 0, and defaults to
-           DEFAULT_PRECISION.
+           precision must be an int >= 0, and defaults to the precision
+           of the current context (initially DEFAULT_PRECISION).
 
            If precision is less than this FixedPoint's current precision,
            information may be lost to rounding.
         """
 
-        try:
-            p = int(precision)
-        except:
-            raise TypeError("precision not convertable to int: " +
-                            `precision`)
-        if p < 0:
-            raise ValueError("precision must be >= 0: " + `precision`)
+        p = _checkprecision(precision)
 
         if p > self.p:
             self.n = self.n * _tento(p - self.p)
@@ -290,20 +690,134 @@ class FixedPoint(object):
     precision = property(get_precision, set_precision)
 
     def __str__(self):
-        n, p = self.n, self.p
-        i, f = divmod(abs(n), _tento(p))
-        if p:
-            frac = repr(f)[:-1]
-            frac = "0" * (p - len(frac)) + frac
-        else:
-            frac = ""
-        return "-"[:n<0] + \
-               repr(i)[:-1] + \
-               "." + frac
+        return _fmt(self.n, self.p)
 
     def __repr__(self):
         return "FixedPoint" + `(str(self), self.p)`
 
+    def from_scaled(cls, n, precision=None):
+        """Return a new object of this class with the exact value
+           n / 10**precision, without running __init__.
+
+           n must be an int or long (floats, strings etc. raise
+           TypeError rather than being truncated or parsed), and
+           precision must be an int >= 0.
+        """
+        if not isinstance(n, _inttypes):
+            raise TypeError("scaled value must be an int or long: " + `n`)
+        n = long(n)
+        p = _checkprecision(precision)
+        return _mkFP(n, p, cls)
+
+    from_scaled = classmethod(from_scaled)
+
+    def parse_many(cls, strings, precision=None, asarray=0,
+                   bad=None):
+        """Return a list of objects of this class parsed from the
+           strings in strings, or a FixedPointArray if asarray is true.
+
+           Every entry is scanned before any error is reported.  If bad
+           is a list, the indices of malformed entries are appended to it
+           and those entries become None (0 in an array); otherwise
+           ValueError is raised naming all the malformed indices.
+        """
+        p = _checkprecision(precision)
+        rq = _mkFP(0L, p, cls)._roundquotient
+        ns = []
+        append = ns.append
+        errors = []
+        for i, s in enumerate(strings):
+            try:
+                append(_string2scaled(s, p, rq))
+            except (ValueError, TypeError):
+                errors.append(i)
+                append(0L)
+        if errors and bad is None:
+            raise ValueError("can't parse as number at indices " +
+                             `errors`)
+        if asarray:
+            result = FixedPointArray.from_scaled(ns, p, cls)
+        else:
+            result = [_mkFP(n, p, cls) for n in ns]
+            for i in errors:
+                result[i] = None
+        if errors:
+            bad.extend(errors)
+        return result
+
+    parse_many = classmethod(parse_many)
+
+    def parse_numpy(cls, strings, precision=None, bad=None):
+        """Return a FixedPointArray parsed from a NumPy array of strings,
+           flattened in C order.  bad is as for parse_many.
+        """
+        return cls.parse_many(strings.ravel().tolist(), precision, 1, bad)
+
+    parse_numpy = classmethod(parse_numpy)
+
+    def from_floats(cls, floats, precision=None, asarray=0):
+        """Return a list of objects of this class converted exactly from
+           the floats in floats, or a FixedPointArray if asarray is true.
+
+           Each result equals cls(f, precision).  floats may also be a
+           NumPy array, which is flattened in C order.
+        """
+        p = _checkprecision(precision)
+        if hasattr(floats, "ravel"):
+            floats = floats.ravel().tolist()
+        rq = _mkFP(0L, p, cls)._roundquotient
+        m = _tento(p)
+        ratio = _float_ratio
+        ns = []
+        append = ns.append
+        for f in floats:
+            try:
+                top, den = ratio(f)
+            except TypeError:
+                append(cls(f, p).n)
+                continue
+            if den == 1:
+                append(top * m)
+            else:
+                append(rq(top * m, den))
+        if asarray:
+            return FixedPointArray.from_scaled(ns, p, cls)
+        return [_mkFP(n, p, cls) for n in ns]
+
+    from_floats = classmethod(from_floats)
+
+    def with_rounding(cls, rounding):
+        """Return a subclass of this class whose round method is rounding,
+           a rounding function or mode name such as ROUND_FLOOR.
+
+           Arithmetic results keep the subclass, so its rounding applies
+           without changing this class.  Calls with equal arguments
+           return the same class.
+        """
+        rounding = get_rounding(rounding)
+        if cls.round.im_func is rounding:
+            return cls
+        key = cls, rounding
+        try:
+            return _rounding_classes[key]
+        except KeyError:
+            pass
+        name = "%s_%s" % (cls.__name__, rounding.__name__)
+        klass = type(cls)(name, (cls,), {"__slots__": [], "round": rounding,
+                                         "__module__": cls.__module__})
+        _rounding_classes[key] = klass
+        return klass
+
+    with_rounding = classmethod(with_rounding)
+
+    def divisor(cls, d):
+        """Return a Divisor that divides FixedPoints and FixedPointArrays
+           by d, rounding exactly as x / d does.
+        """
+        return Divisor(d)
+
+    divisor = classmethod(divisor)
+
     def copy(self):
         return _mkFP(self.n, self.p, type(self))
 
@@ -313,6 +827,16 @@ class FixedPoint(object):
         return self.copy()
 
     def __cmp__(self, other):
+        if isinstance(other, FixedPoint):
+            # the common case, aligned inline rather than by _norm
+            xp, yp = self.p, other.p
+            if xp == yp:
+                return cmp(self.n, other.n)
+            if xp > yp:
+                return cmp(self.n, other.n * _tento(xp - yp))
+            return cmp(self.n * _tento(yp - xp), other.n)
+        if type(other) in _inttypes:
+            return cmp(self.n, other * _tento(self.p))
         xn, yn, p = _norm(self, other, FixedPoint=type(self))
         return cmp(xn, yn)
 
@@ -347,43 +871,207 @@ class FixedPoint(object):
         else:
             return -self
 
+    # With an arithmetic context in use (see getcontext), the results of
+    # + - * / are limited to its max_precision; _capped rounds an exact
+    # result down to it, and * and / round once straight to _maxp(p).
+
     def __add__(self, other):
-        n1, n2, p = _norm(self, other, FixedPoint=type(self))
-        # n1/10**p + n2/10**p = (n1+n2)/10**p
-        return _mkFP(n1 + n2, p, type(self))
+        if type(other) in _inttypes:
+            n, p = self.n + other * _tento(self.p), self.p
+        else:
+            try:
+                n1, n2, p = _norm(self, other, FixedPoint=type(self))
+            except _ArrayOperand:
+                return NotImplemented
+            # n1/10**p + n2/10**p = (n1+n2)/10**p
+            n = n1 + n2
+        if _contextused:
+            return _capped(self, n, p)
+        return _mkFP(n, p, type(self))
 
     __radd__ = __add__
 
     def __sub__(self, other):
-        if not isinstance(other, type(self)):
-            other = type(self)(other, self.p)
-        return self.__add__(-other)
+        if type(other) in _inttypes:
+            n, p = self.n - other * _tento(self.p), self.p
+        else:
+            try:
+                n1, n2, p = _norm(self, other, FixedPoint=type(self))
+            except _ArrayOperand:
+                return NotImplemented
+            n = n1 - n2
+        if _contextused:
+            return _capped(self, n, p)
+        return _mkFP(n, p, type(self))
 
     def __rsub__(self, other):
-        return (-self) + other
+        if type(other) in _inttypes:
+            n, p = other * _tento(self.p) - self.n, self.p
+        else:
+            try:
+                n1, n2, p = _norm(self, other, FixedPoint=type(self))
+            except _ArrayOperand:
+                return NotImplemented
+            n = n2 - n1
+        if _contextused:
+            return _capped(self, n, p)
+        return _mkFP(n, p, type(self))
 
     def __mul__(self, other):
-        n1, n2, p = _norm(self, other, FixedPoint=type(self))
-        # n1/10**p * n2/10**p = (n1*n2/10**p)/10**p
-        return _mkFP(self._roundquotient(n1 * n2, _tento(p)), p, type(self))
+        if type(other) in _inttypes:
+            # n1/10**p * other = (n1*other)/10**p exactly
+            if _contextused:
+                return _capped(self, self.n * other, self.p)
+            return _mkFP(self.n * other, self.p, type(self))
+        try:
+            n1, n2, p = _norm(self, other, FixedPoint=type(self))
+        except _ArrayOperand:
+            return NotImplemented
+        # n1/10**p * n2/10**p = (n1*n2/10**(2p-t))/10**t
+        t = p
+        if _contextused:
+            t = _maxp(p, type(self))
+        return _mkFP(self._roundquotient(n1 * n2, _tento(2 * p - t)), t,
+                     type(self))
 
     __rmul__ = __mul__
 
     def __div__(self, other):
-        n1, n2, p = _norm(self, other, FixedPoint=type(self))
+        if type(other) in _inttypes:
+            if other == 0:
+                raise ZeroDivisionError("FixedPoint division")
+            n1, p = self.n, self.p
+            if other < 0:
+                n1, other = -n1, -other
+            # n1/10**p / other = (n1/(other*10**(p-t)))/10**t
+            t = p
+            if _contextused:
+                t = _maxp(p, type(self))
+                other = other * _tento(p - t)
+            return _mkFP(self._roundquotient(n1, other), t, type(self))
+        try:
+            n1, n2, p = _norm(self, other, FixedPoint=type(self))
+        except _ArrayOperand:
+            return NotImplemented
         if n2 == 0:
             raise ZeroDivisionError("FixedPoint division")
         if n2 < 0:
             n1, n2 = -n1, -n2
-        # n1/10**p / (n2/10**p) = n1/n2 = (n1*10**p/n2)/10**p
-        return _mkFP(self._roundquotient(n1 * _tento(p), n2), p, type(self))
+        # n1/10**p / (n2/10**p) = n1/n2 = (n1*10**t/n2)/10**t
+        t = p
+        if _contextused:
+            t = _maxp(p, type(self))
+        return _mkFP(self._roundquotient(n1 * _tento(t), n2), t, type(self))
 
     def __rdiv__(self, other):
-        n1, n2, p = _norm(self, other, FixedPoint=type(self))
-        return _mkFP(n2, p, FixedPoint=type(self)) / self
+        if type(other) in _inttypes:
+            n1, n2, p = self.n, other * _tento(self.p), self.p
+        else:
+            try:
+                n1, n2, p = _norm(self, other, FixedPoint=type(self))
+            except _ArrayOperand:
+                return NotImplemented
+        if n1 == 0:
+            raise ZeroDivisionError("FixedPoint division")
+        if n1 < 0:
+            n1, n2 = -n1, -n2
+        t = p
+        if _contextused:
+            t = _maxp(p, type(self))
+        return _mkFP(self._roundquotient(n2 * _tento(t), n1), t, type(self))
+
+    # The in-place operators follow the binary operators above, but store
+    # the result in self.  Returning NotImplemented makes Python fall back
+    # to the binary operator, which is how inplace = 0 opts out.  Under an
+    # arithmetic context they simply reuse the binary operators.
+
+    def __iadd__(self, other):
+        if not self.inplace:
+            return NotImplemented
+        if _contextused:
+            result = self + other
+            self.n, self.p = result.n, result.p
+            return self
+        if type(other) in _inttypes:
+            self.n = self.n + other * _tento(self.p)
+        else:
+            try:
+                n1, n2, self.p = _norm(self, other, FixedPoint=type(self))
+            except _ArrayOperand:
+                return NotImplemented
+            self.n = n1 + n2
+        return self
+
+    def __isub__(self, other):
+        if not self.inplace:
+            return NotImplemented
+        if _contextused:
+            result = self - other
+            self.n, self.p = result.n, result.p
+            return self
+        if type(other) in _inttypes:
+            self.n = self.n - other * _tento(self.p)
+        else:
+            try:
+                n1, n2, self.p = _norm(self, other, FixedPoint=type(self))
+            except _ArrayOperand:
+                return NotImplemented
+            self.n = n1 - n2
+        return self
+
+    def __imul__(self, other):
+        if not self.inplace:
+            return NotImplemented
+        if _contextused:
+            result = self * other
+            self.n, self.p = result.n, result.p
+            return self
+        if type(other) in _inttypes:
+            self.n = self.n * other
+        else:
+            try:
+                n1, n2, p = _norm(self, other, FixedPoint=type(self))
+            except _ArrayOperand:
+                return NotImplemented
+            self.n = self._roundquotient(n1 * n2, _tento(p))
+            self.p = p
+        return self
+
+    def __idiv__(self, other):
+        if not self.inplace:
+            return NotImplemented
+        if _contextused:
+            result = self / other
+            self.n, self.p = result.n, result.p
+            return self
+        if type(other) in _inttypes:
+            if other == 0:
+                raise ZeroDivisionError("FixedPoint division")
+            n1 = self.n
+            if other < 0:
+                n1, other = -n1, -other
+            self.n = self._roundquotient(n1, other)
+        else:
+            try:
+                n1, n2, p = _norm(self, other, FixedPoint=type(self))
+            except _ArrayOperand:
+                return NotImplemented
+            if n2 == 0:
+                raise ZeroDivisionError("FixedPoint division")
+            if n2 < 0:
+                n1, n2 = -n1, -n2
+            self.n = self._roundquotient(n1 * _tento(p), n2)
+            self.p = p
+        return self
 
     def __divmod__(self, other):
-        n1, n2, p = _norm(self, other, FixedPoint=type(self))
+        if type(other) in _inttypes:
+            n1, n2, p = self.n, other * _tento(self.p), self.p
+        else:
+            try:
+                n1, n2, p = _norm(self, other, FixedPoint=type(self))
+            except _ArrayOperand:
+                return NotImplemented
         if n2 == 0:
             raise ZeroDivisionError("FixedPoint modulo")
         # floor((n1/10**p)/(n2*10**p)) = floor(n1/n2)
@@ -392,15 +1080,29 @@ class FixedPoint(object):
         return q, _mkFP(n1 - q * n2, p, type(self))
 
     def __rdivmod__(self, other):
-        n1, n2, p = _norm(self, other, FixedPoint=type(self))
-        return divmod(_mkFP(n2, p), self)
+        if type(other) in _inttypes:
+            n1, n2, p = self.n, other * _tento(self.p), self.p
+        else:
+            try:
+                n1, n2, p = _norm(self, other, FixedPoint=type(self))
+            except _ArrayOperand:
+                return NotImplemented
+        if n1 == 0:
+            raise ZeroDivisionError("FixedPoint modulo")
+        q = n2 / n1
+        return q, _mkFP(n2 - q * n1, p, type(self))
 
     def __mod__(self, other):
-        return self.__divmod__(other)[1]
+        result = self.__divmod__(other)
+        if result is NotImplemented:
+            return result
+        return result[1]
 
     def __rmod__(self, other):
-        n1, n2, p = _norm(self, other, FixedPoint=type(self))
-        return _mkFP(n2, p, type(self)).__mod__(self)
+        result = self.__rdivmod__(other)
+        if result is NotImplemented:
+            return result
+        return result[1]
 
     def __float__(self):
         """Return the floating point representation of this FixedPoint. 
@@ -439,31 +1141,462 @@ class FixedPoint(object):
         y must be > 0
         """
         assert y > 0
-        n, leftover = divmod(x, y)
+        # bit_length() * 0.3 estimates the digit count
+        if y.bit_length() * 3 > NEWTON_DIGITS * 10:
+            n, leftover = _bigdivmod(x, y)
+        else:
+            n, leftover = divmod(x, y)
+        if _contextused:
+            rounding = _current().rounding
+            if rounding is not None:
+                return rounding(self, x, y, n, leftover)
         return self.round(x, y, n, leftover)
 
     def __reduce(self):
-        """ Return n, p s.t. self == n/10**p and n % 10 != 0"""
+        """ Return n, p s.t. self == n/10**p and (p == 0 or n % 10 != 0)"""
         n, p = self.n, self.p
+        if not p or n % 10:
+            # the common case: nothing to strip
+            return n, p
         if n == 0:
-            p = 0
-        while p and n % 10 == 0:
-            p = p - 1
+            return n, 0
+        # strip a few zeros a digit at a time; leave long runs to
+        # _stripzeros
+        stop = p - 8
+        while 1:
             n = n / 10
-        return n, p
+            p = p - 1
+            if not p or n % 10:
+                return n, p
+            if p == stop:
+                return _stripzeros(n, p)
+
+    def quantize(self, precision, rounding=None):
+        """Return a new object of this class equal to self rounded to
+           precision, by rounding (a rounding function or mode name) if
+           given, else by this class's round method.
+        """
+        p = _checkprecision(precision)
+        n = self.n
+        if p >= self.p:
+            n = n * _tento(p - self.p)
+        elif rounding is None:
+            n = self._roundquotient(n, _tento(self.p - p))
+        else:
+            d = _tento(self.p - p)
+            q, r = divmod(n, d)
+            n = get_rounding(rounding)(self, n, d, q, r)
+        return type(self).from_scaled(n, p)
+
+    def sort_key(self):
+        """Return a key that orders like the value, across precisions.
+
+           The key is (floor(self), fractional digits without trailing
+           zeros); fractions in [0, 1) order like their digit strings.
+           Equal values have equal keys.
+        """
+        n, p = self.__reduce()
+        if p == 0:
+            return n, ""
+        i, r = divmod(n, _tento(p))
+        return i, "%0*d" % (p, r)
+
+    def allocate(self, weights, asarray=0):
+        """Split self into parts proportional to weights, at self's
+           precision, returning a list (or a FixedPointArray if asarray
+           is true) whose sum is exactly self.
+
+           weights are ints, FixedPoints or numeric strings, >= 0 and not
+           all 0, or a FixedPointArray.  Each part gets the floor of its
+           exact share of |self|, and the units left over go one each to
+           the parts with the largest remainders (earlier parts first on
+           ties); negative amounts are split as their magnitude, negated.
+        """
+        ns = _allocate(self.n, _weights(weights, type(self)))
+        if asarray:
+            return FixedPointArray.from_scaled(ns, self.p, type(self))
+        p, cls = self.p, type(self)
+        return [_mkFP(n, p, cls) for n in ns]
+
+    def normalize(self):
+        """Return a new FixedPoint equal to self, carrying the smallest
+           precision that represents its value exactly.
+
+           FixedPoint("1.500", 3).normalize() has precision 1.
+        """
+        n, p = self.__reduce()
+        return _mkFP(n, p, type(self))
 
 # 2002-10-04 dougfort - Default to Banker's Rounding for backward compatibility
 FixedPoint.round = bankersRounding
 
+# += -= *= /= update the object in place.  Subclasses that want value
+# semantics, so that other references never see the change, set this to 0.
+FixedPoint.inplace = 1
+
 # return 10L**n
+#
+# Powers up to 64 come from a read-only table.  Larger ones are kept in
+# a bounded LRU cache, so a single huge precision can't pin giant longs
+# forever; TENTO_CACHE_SIZE may be changed at run time.
+
+from collections import OrderedDict as _OrderedDict
+
+TENTO_CACHE_SIZE = 128
+
+_tentotable = tuple([10L ** _i for _i in range(65)])
+_tentocache = _OrderedDict()
+_tentostats = [0, 0, 0]     # hits, misses, evictions
+_tentolock = _threading.Lock()
 
-def _tento(n, cache={}):
+def _tento(n, table=_tentotable, tablesize=len(_tentotable)):
     """Cached computation of 10**n"""
+    if 0 <= n < tablesize:
+        return table[n]
+    _tentolock.acquire()
     try:
-        return cache[n]
-    except KeyError:
-        answer = cache[n] = 10L ** n
-        return answer
+        answer = _tentocache.pop(n, None)
+        if answer is not None:
+            _tentocache[n] = answer     # now most recently used
+            _tentostats[0] += 1
+            return answer
+        _tentostats[1] += 1
+    finally:
+        _tentolock.release()
+    # compute outside the lock; a racing thread computes the same value
+    answer = 10L ** n
+    _tentolock.acquire()
+    try:
+        _tentocache[n] = answer
+        while len(_tentocache) > max(TENTO_CACHE_SIZE, 0):
+            _tentocache.popitem(last=False)
+            _tentostats[2] += 1
+    finally:
+        _tentolock.release()
+    return answer
+
+def tento_cache_info():
+    """Return a dict describing the cache of powers of ten above the
+       precomputed table: hits, misses, evictions, size and maxsize."""
+    _tentolock.acquire()
+    try:
+        hits, misses, evictions = _tentostats
+        return {"hits": hits, "misses": misses, "evictions": evictions,
+                "size": len(_tentocache), "maxsize": TENTO_CACHE_SIZE}
+    finally:
+        _tentolock.release()
+
+# Cache of string and float conversions, for feeds that repeat the same
+# few prices and rates.  Entries map (value, precision, class, rounding)
+# to the scaled long, so every FixedPoint built from a hit is still a new
+# object; FrozenFixedPoint caches the immutable objects themselves.  Off
+# unless CONVERSION_CACHE_SIZE is set > 0, which may be done at run time.
+#
+# A hit is a plain dict lookup plus a timestamp update, without taking
+# the lock.  When the cache overflows, the least recently used quarter
+# of it is evicted in one pass.
+
+import itertools as _itertools
+
+CONVERSION_CACHE_SIZE = 0
+
+_convtypes = (type(""), type(0.0))
+_convcache = {}             # key -> [answer, time of last use]
+_convstats = [0, 0, 0]      # hits, misses, evictions
+_convlock = _threading.Lock()
+_convclock = _itertools.count().next
+
+def _convlookup(key):
+    """Return the cached conversion for key, or None."""
+    entry = _convcache.get(key)
+    if entry is None:
+        _convstats[1] += 1
+        return None
+    entry[1] = _convclock()
+    _convstats[0] += 1
+    return entry[0]
+
+def _convstore(key, answer):
+    """Cache answer for key, evicting least recently used entries."""
+    _convlock.acquire()
+    try:
+        _convcache[key] = [answer, _convclock()]
+        size = max(CONVERSION_CACHE_SIZE, 0)
+        if len(_convcache) > size:
+            byage = [(entry[1], k) for k, entry in _convcache.items()]
+            byage.sort()
+            for t, k in byage[:len(byage) - size * 3 // 4]:
+                del _convcache[k]
+                _convstats[2] += 1
+    finally:
+        _convlock.release()
+
+def _cachedscaled(self, value, p, convert):
+    """Return convert(value, p, self._roundquotient), going through the
+       conversion cache when it is enabled."""
+    if CONVERSION_CACHE_SIZE <= 0 or type(value) not in _convtypes:
+        return convert(value, p, self._roundquotient)
+    cls = type(self)
+    key = value, p, cls, _roundingof(cls)
+    n = _convlookup(key)
+    if n is None:
+        n = convert(value, p, self._roundquotient)
+        _convstore(key, n)
+    return n
+
+def conversion_cache_info():
+    """Return a dict describing the string and float conversion cache:
+       hits, misses, evictions, size and maxsize."""
+    _convlock.acquire()
+    try:
+        hits, misses, evictions = _convstats
+        return {"hits": hits, "misses": misses, "evictions": evictions,
+                "size": len(_convcache), "maxsize": CONVERSION_CACHE_SIZE}
+    finally:
+        _convlock.release()
+
+def _stripzeros(n, p, _tento=_tento):
+    """Return n, p with up to p trailing decimal zeros stripped from n.
+
+        Strips 1, 2, 4, ... digits at a time while that succeeds, then
+        binary-searches the remainder, so the number of divisions grows
+        with the log of the number of zeros removed rather than linearly.
+    """
+    if n == 0:
+        return n, 0
+    if not p or n % 10:
+        return n, p
+    step = 1
+    while step <= p:
+        q, r = divmod(n, _tento(step))
+        if r:
+            break
+        n, p = q, p - step
+        step = step << 1
+    # fewer than step zeros remain
+    step = step >> 1
+    while step:
+        if step <= p:
+            q, r = divmod(n, _tento(step))
+            if not r:
+                n, p = q, p - step
+        step = step >> 1
+    return n, p
+
+# Division of huge longs.  CPython's long division is schoolbook, while
+# its multiplication is Karatsuba, so above NEWTON_DIGITS digits we divide
+# by multiplying with a reciprocal computed by Newton's iteration.  The
+# reciprocals of powers of ten (the divisors of * and set_precision) are
+# cached, which is where this pays off; a one-off reciprocal costs more
+# than it saves unless the divisor is about 32 times larger still.
+
+NEWTON_DIGITS = 1500
+RECIPROCAL_CACHE_SIZE = 16
+
+_reciprocals = _OrderedDict()   # k -> (floor(2**S / 10**k), S)
+_reciprocallock = _threading.Lock()
+
+def _reciprocal(d, S):
+    """Return floor(2**S / d) for d > 0 and S >= d.bit_length()."""
+    k = d.bit_length()
+    n = S - k + 1           # bits in the result
+    if n <= 256:
+        return (1L << S) / d
+    # get the leading half of the bits from a truncated d, then double
+    # the precision with one Newton step y += y * (2**S - d*y) / 2**S
+    h = (n >> 1) + 16
+    e = k - h - 16
+    if e > 0:
+        # rounding d up keeps y an underestimate
+        y = _reciprocal((d >> e) + 1, S - (n - h) - e) << (n - h)
+    else:
+        y = _reciprocal(d, S - (n - h)) << (n - h)
+    y += (y * ((1L << S) - d * y)) >> S
+    r = (1L << S) - d * y
+    while r < 0:
+        y -= 1
+        r += d
+    while r >= d:
+        y += 1
+        r -= d
+    return y
+
+def _barrett(x, d, m, S):
+    """Return divmod(x, d) for 0 <= x < 2**S, given m = floor(2**S / d)."""
+    t = d.bit_length() - 1
+    q = ((x >> t) * m) >> (S - t)
+    r = x - q * d
+    # q can only be a few too small
+    while r >= d:
+        q += 1
+        r -= d
+    return q, r
+
+def _pow10divmod(x, k):
+    """Return divmod(x, 10**k) for x >= 0, via a cached reciprocal."""
+    d = _tento(k)
+    bits = max(x.bit_length(), d.bit_length())
+    _reciprocallock.acquire()
+    try:
+        entry = _reciprocals.pop(k, None)
+        if entry is not None:
+            _reciprocals[k] = entry
+    finally:
+        _reciprocallock.release()
+    if entry is None or entry[1] < bits:
+        # leave room for somewhat larger dividends next time
+        S = bits + (bits >> 2)
+        m = _reciprocal(d, S)
+        _reciprocallock.acquire()
+        try:
+            _reciprocals[k] = m, S
+            while len(_reciprocals) > max(RECIPROCAL_CACHE_SIZE, 0):
+                _reciprocals.popitem(last=False)
+        finally:
+            _reciprocallock.release()
+    else:
+        m, S = entry
+        if S > bits:
+            # floor(floor(2**S / d) / 2**(S-bits)) == floor(2**bits / d)
+            m, S = m >> (S - bits), bits
+    return _barrett(x, d, m, S)
+
+def _pow10exponent(y):
+    """Return k if y is 10**k as held by _tento's table or cache, else None."""
+    k = int((y.bit_length() - 1) * 0.30102999566398120)
+    for k in (k, k + 1):
+        if k < len(_tentotable):
+            power = _tentotable[k]
+        else:
+            power = _tentocache.get(k)
+        if power is not None and (power is y or power == y):
+            return k
+    return None
+
+def _bigdivmod(x, y):
+    """Return divmod(x, y) for y > 0, by reciprocal multiplication where
+       that is faster."""
+    k = _pow10exponent(y)
+    if k is None and y.bit_length() * 3 <= NEWTON_DIGITS * 320:
+        return divmod(x, y)
+    if x < 0:
+        q, r = _bigdivmod(-x, y)
+        if r:
+            return -q - 1, y - r
+        return -q, r
+    if k is not None:
+        return _pow10divmod(x, k)
+    S = max(x.bit_length(), y.bit_length())
+    return _barrett(x, y, _reciprocal(y, S), S)
+
+# Python's own long <-> decimal string conversions are quadratic in the
+# number of digits.  Above _DC_DIGITS digits we divide and conquer instead,
+# splitting on powers 10**(_DC_LEAF * 2**j) so the same few powers (from
+# _tento) and their reciprocals are reused.  Parsing then costs about as
+# much as a Karatsuba multiply, and formatting replaces each division by
+# a multiply with a cached reciprocal.
+
+_DC_DIGITS = 10000
+_DC_LEAF = 500
+
+def _divmod10(n, j):
+    """Return divmod(n, 10**(_DC_LEAF << j)) for n >= 0."""
+    return _pow10divmod(n, _DC_LEAF << j)
+
+def _long2str(n):
+    """Return "%d" % n for a long n >= 0, in subquadratic time."""
+    # enough digits: n < 2**bits <= 10**(bits*log10(2) + 1)
+    ndigits = int(n.bit_length() * 0.30103) + 1
+    j = 0
+    while (_DC_LEAF << (j+1)) < ndigits:
+        j += 1
+    pieces = []
+    _long2pieces(n, j, 0, pieces.append)
+    return "".join(pieces)
+
+def _long2pieces(n, j, pad, append):
+    if j < 0:
+        if pad:
+            append("%0*d" % (_DC_LEAF, n))
+        else:
+            append("%d" % n)
+        return
+    q, r = _divmod10(n, j)
+    if q or pad:
+        _long2pieces(q, j-1, pad, append)
+        _long2pieces(r, j-1, 1, append)
+    else:
+        _long2pieces(r, j-1, 0, append)
+
+def _str2long(digits):
+    """Return long(digits) for a string of decimal digits, in subquadratic
+       time."""
+    if len(digits) <= _DC_LEAF:
+        return long(digits)
+    j = 0
+    while (_DC_LEAF << (j+1)) < len(digits):
+        j += 1
+    k = _DC_LEAF << j
+    return _str2long(digits[:-k]) * _tento(k) + _str2long(digits[-k:])
+
+def _digits(n, p):
+    """Return abs(n) in decimal, zero-padded to at least p+1 digits."""
+    # 3.33 bits per digit
+    if n.bit_length() > _DC_DIGITS * 3:
+        digits = _long2str(abs(n))
+        return "0" * (p + 1 - len(digits)) + digits
+    return "%0*d" % (p + 1, abs(n))
+
+def _fmt(n, p):
+    """Return the string for n / 10**p in the format of FixedPoint.__str__."""
+    # one decimal conversion, padded so there's a digit before the point
+    digits = _digits(n, p)
+    if p:
+        return "-"[:n<0] + digits[:-p] + "." + digits[-p:]
+    return "-"[:n<0] + digits + "."
+
+def _group(digits, thousands):
+    """Return the string of digits with thousands between groups of 3."""
+    head = len(digits) % 3 or 3
+    if head == len(digits):
+        return digits
+    return thousands.join([digits[:head]] +
+                          [digits[i:i+3] for i in range(head, len(digits), 3)])
+
+def format_many(values, sep="\n", thousands=None, width=None, point="."):
+    """Return one string holding the FixedPoints in values, joined by sep.
+
+        values is any iterable of FixedPoints, or a FixedPointArray.  Each
+        value is formatted as by str(), except that the integer digits are
+        grouped in threes separated by thousands if given, the decimal
+        point is point, and the result is right-justified in width
+        characters if given.
+    """
+    if isinstance(values, FixedPointArray):
+        p = values.p
+        pairs = [(n, p) for n in values.n]
+    else:
+        pairs = [(x.n, x.p) for x in values]
+    if thousands is None and point == ".":
+        strings = [_fmt(n, p) for n, p in pairs]
+    else:
+        strings = []
+        append = strings.append
+        for n, p in pairs:
+            digits = _digits(n, p)
+            i = len(digits) - p
+            intpart = digits[:i]
+            if thousands is not None:
+                intpart = _group(intpart, thousands)
+            append("-"[:n<0] + intpart + point + digits[i:])
+    if width is not None:
+        strings = [x.rjust(width) for x in strings]
+    return sep.join(strings)
+
+class _ArrayOperand(Exception):
+    """Raised by _norm for a FixedPointArray operand; the scalar operators
+       then return NotImplemented, so the array's reflected operator runs
+       with FixedPointArray's elementwise semantics."""
 
 def _norm(x, y, isinstance=isinstance, FixedPoint=FixedPoint,
                 _tento=_tento):
@@ -473,12 +1606,15 @@ def _norm(x, y, isinstance=isinstance, FixedPoint=FixedPoint,
            y = yn / 10**p
 
         x must be FixedPoint to begin with; if y is not FixedPoint,
-        it inherits its precision from x.
+        it inherits its precision from x.  A FixedPointArray y raises
+        _ArrayOperand.
 
         Note that this method is called a lot, so default-arg tricks are helpful.
     """
     assert isinstance(x, FixedPoint)
     if not isinstance(y, FixedPoint):
+        if isinstance(y, FixedPointArray):
+            raise _ArrayOperand
         y = FixedPoint(y, x.p)
     xn, yn = x.n, y.n
     xp, yp = x.p, y.p
@@ -492,14 +1628,305 @@ def _norm(x, y, isinstance=isinstance, FixedPoint=FixedPoint,
         p = xp  # same as yp
     return xn, yn, p
 
-def _mkFP(n, p, FixedPoint=FixedPoint):
-    """Make FixedPoint objext - Return a new FixedPoint object with the selected precision."""
-    f = FixedPoint()
-    #print '_mkFP Debug: %s, value=%s' % (type(f),n)
-    f.n = n
-    f.p = p
+def _mkFP(n, p, FixedPoint=FixedPoint, new=object.__new__,
+          setn=FixedPoint.n.__set__, setp=FixedPoint.p.__set__):
+    """Make FixedPoint objext - Return a new FixedPoint object with the selected precision.
+
+        The slots are written directly, through their descriptors (which
+        works for FrozenFixedPoint too); __init__ (including that of any
+        subclass) is not run, so n must already be a long and p an int >= 0.
+    """
+    f = new(FixedPoint)
+    setn(f, n)
+    setp(f, p)
     return f
 
+_fixed_classes = {}
+
+_rounding_classes = {}
+
+def fixed_class(precision, rounding=bankersRounding, name=None):
+    """Return a FixedPoint subclass whose precision is fixed at precision.
+
+        Every instance of the class carries exactly that precision, so
+        operations between two instances of the same class skip the
+        alignment done by _norm and use a precomputed 10**precision.
+        Other operands are coerced to the class first, as for any
+        FixedPoint subclass.  rounding becomes the class's round method.
+        The constructors and set_precision() take a precision of None as
+        the class precision, and raise ValueError for any other.
+
+        Calls with equal arguments return the same class.
+    """
+    p = _checkprecision(precision)
+    rounding = get_rounding(rounding)
+    if name is None:
+        name = "FixedPoint%d" % p
+    key = p, rounding, name
+    try:
+        return _fixed_classes[key]
+    except KeyError:
+        pass
+
+    scale = _tento(p)
+    base = FixedPoint
+
+    def fixedprecision(precision):
+        # None means the class precision; anything else must match it
+        if precision is not None and precision != p:
+            raise ValueError("precision of %s is fixed at %d: %r"
+                             % (name, p, precision))
+        return p
+
+    class Fixed(base):
+        __slots__ = []
+
+        def __init__(self, value=0, precision=p):
+            fixedprecision(precision)
+            if type(value) is cls and value.p == p:
+                self.n, self.p = value.n, p
+            elif isinstance(value, _inttypes):
+                self.n, self.p = long(value) * scale, p
+            else:
+                base.__init__(self, value, p)
+
+        def set_precision(self, precision=p):
+            fixedprecision(precision)
+
+        precision = property(base.get_precision, set_precision)
+
+        def from_scaled(klass, n, precision=p):
+            fixedprecision(precision)
+            return base.from_scaled.im_func(klass, n, p)
+
+        from_scaled = classmethod(from_scaled)
+
+        def with_rounding(klass, rounding):
+            return fixed_class(p, rounding, name)
+
+        with_rounding = classmethod(with_rounding)
+
+        def parse_many(klass, strings, precision=p, asarray=0, bad=None):
+            fixedprecision(precision)
+            return base.parse_many.im_func(klass, strings, p, asarray, bad)
+
+        parse_many = classmethod(parse_many)
+
+        def from_floats(klass, floats, precision=p, asarray=0):
+            fixedprecision(precision)
+            return base.from_floats.im_func(klass, floats, p, asarray)
+
+        from_floats = classmethod(from_floats)
+
+        def parse_numpy(klass, strings, precision=p, bad=None):
+            return klass.parse_many(strings.ravel().tolist(), precision, 1,
+                                    bad)
+
+        parse_numpy = classmethod(parse_numpy)
+
+        def __repr__(self):
+            return "%s(%r)" % (name, str(self))
+
+        def normalize(self):
+            # the reduced precision can't be carried by this class
+            return _mkFP(self.n, p, base).normalize()
+
+        def __cmp__(self, other):
+            if type(other) is cls and self.p == other.p == p:
+                return cmp(self.n, other.n)
+            return base.__cmp__(self, other)
+
+        def __add__(self, other):
+            if type(other) is cls and self.p == other.p == p:
+                return _mkFP(self.n + other.n, p, cls)
+            return base.__add__(self, other)
+
+        __radd__ = __add__
+
+        def __sub__(self, other):
+            if type(other) is cls and self.p == other.p == p:
+                return _mkFP(self.n - other.n, p, cls)
+            return base.__sub__(self, other)
+
+        def __rsub__(self, other):
+            return base.__rsub__(self, other)
+
+        def __mul__(self, other):
+            if type(other) is cls and self.p == other.p == p:
+                return _mkFP(self._roundquotient(self.n * other.n, scale),
+                             p, cls)
+            return base.__mul__(self, other)
+
+        __rmul__ = __mul__
+
+        def __div__(self, other):
+            if type(other) is cls and self.p == other.p == p:
+                n1, n2 = self.n, other.n
+                if n2 == 0:
+                    raise ZeroDivisionError("FixedPoint division")
+                if n2 < 0:
+                    n1, n2 = -n1, -n2
+                return _mkFP(self._roundquotient(n1 * scale, n2), p, cls)
+            return base.__div__(self, other)
+
+        def __rdiv__(self, other):
+            return base.__rdiv__(self, other)
+
+        def __divmod__(self, other):
+            if type(other) is cls and self.p == other.p == p:
+                n1, n2 = self.n, other.n
+                if n2 == 0:
+                    raise ZeroDivisionError("FixedPoint modulo")
+                q = n1 / n2
+                return q, _mkFP(n1 - q * n2, p, cls)
+            return base.__divmod__(self, other)
+
+        def __rdivmod__(self, other):
+            return base.__rdivmod__(self, other)
+
+    cls = Fixed
+    cls.__name__ = name
+    cls.round = rounding
+    cls.PRECISION = p
+    _fixed_classes[key] = cls
+    return cls
+
+class FrozenFixedPoint(FixedPoint):
+    """Immutable FixedPoint.
+
+        set_precision() and assigning or deleting attributes raise
+        TypeError, so the normalized form used by
+        hash() and float() and the hash itself are computed at most once
+        per object.  FrozenFixedPoints compare and hash exactly like
+        FixedPoints of equal value, so the two can be mixed as dict keys.
+        Constructing -1, 0 or 1 at a small precision returns a shared
+        instance.  Arithmetic results are new FrozenFixedPoints.
+    """
+    __slots__ = ['_reduced', '_hash']
+    inplace = 0
+
+    def __new__(cls, value=0, precision=None):
+        if precision is None:
+            precision = _checkprecision(None)
+        if cls is FrozenFixedPoint and type(value) in _inttypes:
+            try:
+                return _interned[value, precision]
+            except (KeyError, TypeError):
+                pass
+        if CONVERSION_CACHE_SIZE > 0 and type(value) in _convtypes:
+            p = _checkprecision(precision)
+            key = value, p, cls, _roundingof(cls)
+            self = _convlookup(key)
+            if self is None:
+                proto = _mkFP(0L, p, cls)
+                if type(value) is float:
+                    n = _float2scaled(value, p, proto._roundquotient)
+                else:
+                    n = _string2scaled(value, p, proto._roundquotient)
+                self = _mkFP(n, p, cls)
+                _convstore(key, self)
+            return self
+        # convert the common types as FixedPoint.__init__ does, writing
+        # the slots once through _mkFP
+        p = _checkprecision(precision)
+        proto = _mkFP(0L, p, cls)
+        if type(value) in _inttypes:
+            n = long(value) * _tento(p)
+        elif isinstance(value, str):
+            n = _cachedscaled(proto, value, p, _string2scaled)
+        elif isinstance(value, float):
+            n = _cachedscaled(proto, value, p, _float2scaled)
+        elif isinstance(value, FixedPoint):
+            n, vp = value.n, value.p
+            if vp < p:
+                n = n * _tento(p - vp)
+            elif vp > p:
+                n = proto._roundquotient(n, _tento(vp - p))
+        else:
+            # FixedPoint.__init__ assigns the slots, so run it on a
+            # thawed instance that rounds like cls
+            proto = object.__new__(_thawed(cls))
+            FixedPoint.__init__(proto, value, p)
+            n = proto.n
+        return _mkFP(n, p, cls)
+
+    def __init__(self, value=0, precision=None):
+        # all the work is done by __new__
+        pass
+
+    def set_precision(self, precision=None):
+        raise TypeError("FrozenFixedPoint is immutable")
+
+    def __setattr__(self, name, value):
+        raise TypeError("FrozenFixedPoint is immutable")
+
+    def __delattr__(self, name):
+        raise TypeError("FrozenFixedPoint is immutable")
+
+    precision = property(FixedPoint.get_precision, set_precision)
+
+    def copy(self):
+        return self
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        # pickle would restore the slots through __setattr__
+        return _mkFP, (self.n, self.p, type(self))
+
+    def __repr__(self):
+        return "FrozenFixedPoint" + `(str(self), self.p)`
+
+    def __cmp__(self, other):
+        if isinstance(other, FixedPoint):
+            # any FixedPoint compares exactly, as it would against a
+            # FixedPoint
+            return FixedPoint.__cmp__(self, other)
+        if type(other) in _inttypes:
+            return cmp(self.n, other * _tento(self.p))
+        xn, yn, p = _norm(self, other)
+        return cmp(xn, yn)
+
+    def __hash__(self):
+        try:
+            return self._hash
+        except AttributeError:
+            h = FixedPoint.__hash__(self)
+            object.__setattr__(self, "_hash", h)
+            return h
+
+    def _FixedPoint__reduce(self):
+        try:
+            return self._reduced
+        except AttributeError:
+            r = FixedPoint._FixedPoint__reduce(self)
+            object.__setattr__(self, "_reduced", r)
+            return r
+
+_thawed_classes = {}
+
+def _thawed(cls):
+    """Return a subclass of FrozenFixedPoint subclass cls whose slots can
+       be assigned, for running FixedPoint.__init__ with cls's rounding."""
+    try:
+        return _thawed_classes[cls]
+    except KeyError:
+        thawed = type(cls)(cls.__name__, (cls,),
+                           {"__slots__": [],
+                            "__setattr__": object.__setattr__,
+                            "__module__": cls.__module__})
+        _thawed_classes[cls] = thawed
+        return thawed
+
+_interned = {}
+for _p in range(9):
+    for _i in (-1, 0, 1):
+        _interned[_i, _p] = _mkFP(_i * _tento(_p), _p, FrozenFixedPoint)
+del _p, _i
+
 # crud for parsing strings
 import re
 
@@ -525,7 +1952,32 @@ del re
 
 
 def _string2exact(s):
-    """Return n, p s.t. float string value == n * 10**p exactly."""
+    """Return n, p s.t. float string value == n * 10**p exactly.
+
+        For strings without an exponent, -p is the number of digits after
+        the decimal point, so FixedPoint.__init__ needn't round when it
+        equals the target precision.
+    """
+    # fast path for plain [-]digits[.digits]; anything else (signs,
+    # whitespace, exponents, a leading '.') goes through _parser
+    t = s
+    if t[:1] == "-":
+        t = t[1:]
+    point = t.find(".")
+    if point < 0:
+        intpart, fracpart = t, ""
+    else:
+        intpart, fracpart = t[:point], t[point+1:]
+    if intpart.isdigit() and (fracpart == "" or fracpart.isdigit()):
+        digits = intpart + fracpart
+        if len(digits) > _DC_DIGITS:
+            i = _str2long(digits)
+        else:
+            i = long(digits)
+        if t is not s:
+            i = -i
+        return i, -len(fracpart)
+
     m = _parser(s)
     if m is None:
         raise ValueError("can't parse as number: " + `s`)
@@ -542,21 +1994,1115 @@ def _string2exact(s):
         fracpart = m.group('onlyfrac')
     else:
         fracpart = m.group('frac')
-        if fracpart is None or fracpart == "":
-            fracpart = "0"
+        if fracpart is None:
+            fracpart = ""
     assert intpart
-    assert fracpart
 
-    i, f = long(intpart), long(fracpart)
-    nfrac = len(fracpart)
-    i = i * _tento(nfrac) + f
-    exp = exp - nfrac
+    digits = intpart + fracpart
+    if len(digits) > _DC_DIGITS:
+        i = _str2long(digits)
+    else:
+        i = long(digits)
+    exp = exp - len(fracpart)
 
     if m.group('sign') == "-":
         i = -i
 
     return i, exp
 
+_float_ratio = float.as_integer_ratio
+
+def _float2scaled(f, p, roundquotient):
+    """Return n s.t. n / 10**p is float f rounded to precision p, where
+       roundquotient does the rounding of f * 10**p.
+
+        f = top / den exactly, with den a power of 2, so one rounded
+        division gives n.  The sign stays with top, as directed roundings
+        need it.  Infinities and NaNs raise OverflowError and ValueError.
+    """
+    top, den = _float_ratio(f)
+    top = top * _tento(p)
+    if den == 1:
+        return top
+    return roundquotient(top, den)
+
+def _string2scaled(s, p, roundquotient):
+    """Return n s.t. n / 10**p is string s rounded to precision p, where
+       roundquotient(x, y) rounds x / y."""
+    n, exp = _string2exact(s)
+    # exact value is n*10**exp = n*10**(exp+p)/10**p
+    effective_exp = exp + p
+    if effective_exp > 0:
+        n = n * _tento(effective_exp)
+    elif effective_exp < 0:
+        n = roundquotient(n, _tento(-effective_exp))
+    return n
+
+# FixedPointArray -- a column of FixedPoints sharing a single precision.
+
+from array import array as _array
+import operator as _operator
+
+def _pack(ns, _array=_array):
+    """Return ns as an array('l') if every element fits in a machine long,
+       else as a list of longs."""
+    ns = list(ns)
+    try:
+        return _array('l', ns)
+    except OverflowError:
+        return ns
+
+class FixedPointArray(object):
+    """Array of FixedPoint values sharing one precision.
+
+        The exact value of element i is self.n[i] / 10**self.p;
+        self.n is an array('l') when all scaled values fit in a machine
+        long, and a list of longs otherwise; self.p is an int.
+        Elements are materialized as instances of self.fptype.
+    """
+    __slots__ = ['n', 'p', 'fptype']
+
+    def __init__(self, values=(), precision=None,
+                 fptype=FixedPoint):
+        p = fptype(0, precision).p
+        ns = []
+        for value in values:
+            if not isinstance(value, FixedPoint) or value.p != p:
+                value = fptype(value, p)
+            ns.append(value.n)
+        self.n = _pack(ns)
+        self.p = p
+        self.fptype = fptype
+
+    def from_scaled(cls, ns, precision=None, fptype=FixedPoint):
+        """Return a new array whose element i is ns[i] / 10**precision."""
+        a = object.__new__(cls)
+        a.n = _pack(ns)
+        a.p = fptype(0, precision).p
+        a.fptype = fptype
+        return a
+
+    from_scaled = classmethod(from_scaled)
+
+    def _new(self, ns, p):
+        """Return a new array of our type holding the scaled values ns."""
+        a = object.__new__(type(self))
+        a.n = _pack(ns)
+        a.p = p
+        a.fptype = self.fptype
+        return a
+
+    def _roundquotient(self, p):
+        """Return the _roundquotient of our element type at precision p."""
+        return _mkFP(0L, p, self.fptype)._roundquotient
+
+    def _roundmany(self, p):
+        """Return f(ns, d), the list of our element type's _roundquotient
+           of each n in ns by d, at precision p."""
+        return _roundmany(_mkFP(0L, p, self.fptype))
+
+    def _capped(self, ns, p):
+        """Return a new array of the exact scaled values ns at precision
+           p, rounded to the context's max_precision as for FixedPoint."""
+        if _contextused:
+            t = _maxp(p, self.fptype)
+            if t < p:
+                return self._new(self._roundmany(t)(ns, _tento(p - t)), t)
+        return self._new(ns, p)
+
+    def _align(self, other):
+        """Return xs, ys, p, isarray s.t.
+               p = max(self.p, other.p)
+               xs and ys are the scaled values of self and other at p
+
+            ys is a sequence if other is a FixedPointArray (isarray is
+            true), else a single long.  Scalars are coerced as by _norm.
+        """
+        xs, xp = self.n, self.p
+        if isinstance(other, FixedPointArray):
+            if len(other.n) != len(xs):
+                raise ValueError("FixedPointArray length mismatch: %d != %d"
+                                 % (len(xs), len(other.n)))
+            ys, yp, isarray = other.n, other.p, 1
+        else:
+            if not isinstance(other, self.fptype):
+                other = self.fptype(other, xp)
+            ys, yp, isarray = other.n, other.p, 0
+        if xp > yp:
+            m = _tento(xp - yp)
+            if isarray:
+                ys = [y * m for y in ys]
+            else:
+                ys = ys * m
+            p = xp
+        elif xp < yp:
+            m = _tento(yp - xp)
+            xs = [x * m for x in xs]
+            p = yp
+        else:
+            p = xp
+        return xs, ys, p, isarray
+
+    def get_precision(self):
+        """Return the precision shared by the elements of this array."""
+        return self.p
+
+    def set_precision(self, precision=None):
+        """Change the precision of every element, rounding as
+           FixedPoint.set_precision does."""
+        p = self.fptype(0, precision).p
+        if p > self.p:
+            m = _tento(p - self.p)
+            self.n = _pack([x * m for x in self.n])
+        elif p < self.p:
+            self.n = _pack(self._roundmany(p)(self.n, _tento(self.p - p)))
+        self.p = p
+
+    precision = property(get_precision, set_precision)
+
+    def __len__(self):
+        return len(self.n)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self._new(self.n[i], self.p)
+        return _mkFP(long(self.n[i]), self.p, self.fptype)
+
+    def __setitem__(self, i, value):
+        if not isinstance(value, FixedPoint) or value.p != self.p:
+            value = self.fptype(value, self.p)
+        try:
+            self.n[i] = value.n
+        except OverflowError:
+            self.n = list(self.n)
+            self.n[i] = value.n
+
+    def __iter__(self):
+        p, fptype = self.p, self.fptype
+        for x in self.n:
+            yield _mkFP(long(x), p, fptype)
+
+    def tolist(self):
+        """Return the elements as a list of FixedPoints."""
+        return list(self)
+
+    def __repr__(self):
+        return type(self).__name__ + `([str(x) for x in self], self.p)`
+
+    def copy(self):
+        return self._new(self.n, self.p)
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    def __neg__(self):
+        return self._new([-x for x in self.n], self.p)
+
+    def __abs__(self):
+        return self._new([abs(x) for x in self.n], self.p)
+
+    def __add__(self, other):
+        xs, ys, p, isarray = self._align(other)
+        if isarray:
+            return self._capped(map(_operator.add, xs, ys), p)
+        return self._capped([x + ys for x in xs], p)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        xs, ys, p, isarray = self._align(other)
+        if isarray:
+            return self._capped(map(_operator.sub, xs, ys), p)
+        return self._capped([x - ys for x in xs], p)
+
+    def __rsub__(self, other):
+        xs, y, p, isarray = self._align(other)
+        return self._capped([y - x for x in xs], p)
+
+    def __mul__(self, other):
+        xs, ys, p, isarray = self._align(other)
+        t = p
+        if _contextused:
+            t = _maxp(p, self.fptype)
+        rm = self._roundmany(t)
+        if isarray:
+            ns = map(_operator.mul, xs, ys)
+        else:
+            ns = [x * ys for x in xs]
+        return self._new(rm(ns, _tento(2 * p - t)), t)
+
+    __rmul__ = __mul__
+
+    def __div__(self, other):
+        xs, ys, p, isarray = self._align(other)
+        if not isarray:
+            ys = [ys] * len(xs)
+        if _contextused:
+            p = _maxp(p, self.fptype)
+        return self._new(_divide(xs, ys, p, self._roundquotient(p)), p)
+
+    def __rdiv__(self, other):
+        xs, y, p, isarray = self._align(other)
+        if _contextused:
+            p = _maxp(p, self.fptype)
+        return self._new(_divide([y] * len(xs), xs, p,
+                                 self._roundquotient(p)), p)
+
+    def __divmod__(self, other):
+        xs, ys, p, isarray = self._align(other)
+        if not isarray:
+            ys = [ys] * len(xs)
+        qs, rs = _divmod(xs, ys)
+        return qs, self._new(rs, p)
+
+    def __rdivmod__(self, other):
+        xs, y, p, isarray = self._align(other)
+        qs, rs = _divmod([y] * len(xs), xs)
+        return qs, self._new(rs, p)
+
+    def __mod__(self, other):
+        return self.__divmod__(other)[1]
+
+    def __rmod__(self, other):
+        return self.__rdivmod__(other)[1]
+
+    def _compare(self, other, op):
+        xs, ys, p, isarray = self._align(other)
+        if isarray:
+            return map(op, xs, ys)
+        return [op(x, ys) for x in xs]
+
+    # Comparisons are elementwise and return a list of bools.
+    def __lt__(self, other):
+        return self._compare(other, _operator.lt)
+
+    def __le__(self, other):
+        return self._compare(other, _operator.le)
+
+    def __eq__(self, other):
+        return self._compare(other, _operator.eq)
+
+    def __ne__(self, other):
+        return self._compare(other, _operator.ne)
+
+    def __gt__(self, other):
+        return self._compare(other, _operator.gt)
+
+    def __ge__(self, other):
+        return self._compare(other, _operator.ge)
+
+    __hash__ = None
+
+    def sum(self):
+        """Return the exact sum of the elements as a FixedPoint."""
+        return _mkFP(long(sum(self.n)), self.p, self.fptype)
+
+    def min(self):
+        """Return the smallest element as a FixedPoint."""
+        return _mkFP(long(min(self.n)), self.p, self.fptype)
+
+    def max(self):
+        """Return the largest element as a FixedPoint."""
+        return _mkFP(long(max(self.n)), self.p, self.fptype)
+
+    def argsort(self, reverse=0):
+        """Return the indices that would sort the elements."""
+        return sorted(range(len(self.n)), key=self.n.__getitem__,
+                      reverse=reverse)
+
+    def sort(self, reverse=0):
+        """Sort the elements in place."""
+        self.n = _pack(sorted(self.n, reverse=reverse))
+
+def _roundmany(proto):
+    """Return f(ns, d) -> [proto._roundquotient(n, d) for n in ns], using
+       the vectorized form of proto's rounding when it has one."""
+    rq = proto._roundquotient
+    v = None
+    if type(proto)._roundquotient.im_func is FixedPoint._roundquotient.im_func:
+        rounding = _roundingof(type(proto))
+        v = _vroundings.get(getattr(rounding, "im_func", rounding))
+    def roundmany(ns, d):
+        if v is not None and d.bit_length() * 3 <= NEWTON_DIGITS * 10:
+            return v(ns, d)
+        return [rq(n, d) for n in ns]
+    return roundmany
+
+def _divide(xs, ys, p, rq):
+    """Return [rq(x * 10**p, y)] with the sign handling of __div__."""
+    m = _tento(p)
+    result = []
+    append = result.append
+    for x, y in zip(xs, ys):
+        if y == 0:
+            raise ZeroDivisionError("FixedPointArray division")
+        if y < 0:
+            x, y = -x, -y
+        append(rq(x * m, y))
+    return result
+
+def _divmod(xs, ys):
+    """Return the quotients and scaled remainders of __divmod__."""
+    qs, rs = [], []
+    for x, y in zip(xs, ys):
+        if y == 0:
+            raise ZeroDivisionError("FixedPointArray modulo")
+        q = long(x) / y
+        qs.append(q)
+        rs.append(x - q * y)
+    return qs, rs
+
+class Divisor(object):
+    """Divide many values by the same divisor.
+
+        divide(x) returns x / d for a FixedPoint or FixedPointArray x.
+        The alignment _norm (or FixedPointArray._align) would compute for
+        d is worked out once per element type and precision of x and
+        cached, so dividing a column by one rate costs a multiply and a
+        rounded division per value.
+    """
+    __slots__ = ['d', '_scaled']
+
+    def __init__(self, d):
+        self.d = d
+        self._scaled = {}
+
+    def __repr__(self):
+        return "Divisor(%r)" % (self.d,)
+
+    def _scale(self, key, x, d, FixedPoint):
+        """Return and cache m, n, p s.t. x / d rounds x.n * m / n at p."""
+        if isinstance(d, _inttypes):
+            # __div__'s int fast path: n1/10**p / d = (n1/d)/10**p
+            m, n, p = 1L, long(d), x.p
+        else:
+            m, n, p = _norm(x, d, FixedPoint=FixedPoint)
+            m = m * _tento(p)
+        if n == 0:
+            raise ZeroDivisionError("FixedPoint division")
+        if n < 0:
+            m, n = -m, -n
+        result = self._scaled[key] = m, n, p
+        return result
+
+    def divide(self, x):
+        """Return x / d for a FixedPoint or FixedPointArray x."""
+        if isinstance(x, FixedPoint):
+            t = type(x)
+            try:
+                m, n, p = self._scaled[t, x.p]
+            except KeyError:
+                m, n, p = self._scale((t, x.p), _mkFP(1L, x.p, t),
+                                      self.d, t)
+            if _contextused:
+                # round to max_precision as __div__ does
+                tp = _maxp(p, t)
+                if tp < p:
+                    n, p = n * _tento(p - tp), tp
+            return _mkFP(x._roundquotient(x.n * m, n), p, t)
+        if isinstance(x, FixedPointArray):
+            t = x.fptype
+            key = FixedPointArray, t, x.p
+            try:
+                m, n, p = self._scaled[key]
+            except KeyError:
+                m, n, p = self._scale(key, _mkFP(1L, x.p, t), self.d, t)
+            if _contextused:
+                tp = _maxp(p, t)
+                if tp < p:
+                    n, p = n * _tento(p - tp), tp
+            return x._new(x._roundmany(p)([v * m for v in x.n], n), p)
+        raise TypeError("Divisor can't divide " + `x`)
+
+    __call__ = divide
+
+    def divide_many(self, values):
+        """Return [x / d for x in values]."""
+        return map(self.divide, values)
+
+# Fused sums of products -- each product is kept exact and the total is
+# rounded once, so the result doesn't depend on the order of the terms.
+
+from itertools import izip as _izip, imap as _imap
+
+def sumprod(rows, precision=None):
+    """Return the sum over rows of the product of each row's factors,
+       rounded once to precision.
+
+        rows is an iterable of sequences of factors, e.g. (quantity,
+        price, rate) per invoice line.  Factors may be FixedPoints or
+        ints; anything else is converted as _norm would, to the type and
+        largest precision of the row's FixedPoint factors.  precision
+        defaults to the largest precision of any FixedPoint factor, and
+        the result has the type of the first one seen (FixedPoint if
+        there are none).
+    """
+    sums = {}
+    fptype, p = None, -1
+    for row in rows:
+        fps = [f for f in row if isinstance(f, FixedPoint)]
+        if fps:
+            rowp = max([f.p for f in fps])
+            if fptype is None:
+                fptype = type(fps[0])
+        else:
+            rowp = _checkprecision(None)
+        n, e = 1L, 0
+        for f in row:
+            if isinstance(f, FixedPoint):
+                n = n * f.n
+                e = e + f.p
+            elif isinstance(f, _inttypes):
+                n = n * f
+            else:
+                f = (fptype or FixedPoint)(f, rowp)
+                n = n * f.n
+                e = e + f.p
+        if rowp > p:
+            p = rowp
+        sums[e] = sums.get(e, 0L) + n
+    if fptype is None:
+        fptype = FixedPoint
+    if p < 0:
+        p = _checkprecision(None)
+    return _roundsum(sums, p, fptype, precision)
+
+def dot(xs, ys, precision=None):
+    """Return the sum of x*y over corresponding elements of xs and ys,
+       rounded once to precision.
+
+        Same as sumprod(zip(xs, ys), precision); two FixedPointArrays of
+        equal length are multiplied through their scaled buffers.
+    """
+    if isinstance(xs, FixedPointArray) and isinstance(ys, FixedPointArray):
+        if len(xs.n) != len(ys.n):
+            raise ValueError("FixedPointArray length mismatch: %d != %d"
+                             % (len(xs.n), len(ys.n)))
+        total = sum(_imap(_operator.mul, xs.n, ys.n), 0L)
+        return _roundsum({xs.p + ys.p: total}, max(xs.p, ys.p),
+                         xs.fptype, precision)
+    return sumprod(_izip(xs, ys), precision)
+
+def _resultprecision(fptype, p):
+    """Return the default precision of a result computed at p: that of a
+       fixed_class fptype, else p limited to the context's max_precision."""
+    fixed = getattr(fptype, "PRECISION", None)
+    if fixed is not None:
+        return fixed
+    if _contextused:
+        return _maxp(p, fptype)
+    return p
+
+def _roundsum(sums, p, fptype, precision=None):
+    """Return sum(n / 10**e for e, n in sums.items()) as an fptype,
+       rounded to precision (if None, _resultprecision(fptype, p)) by
+       fptype's rounding.
+    """
+    if precision is not None:
+        p = _checkprecision(precision)
+    else:
+        p = _resultprecision(fptype, p)
+    total, e = 0L, 0
+    if sums:
+        e = max(sums.keys())
+        for k, n in sums.items():
+            total = total + n * _tento(e - k)
+    if e > p:
+        total = _mkFP(0L, p, fptype)._roundquotient(total, _tento(e - p))
+    elif e < p:
+        total = total * _tento(p - e)
+    return fptype.from_scaled(total, p)
+
+# Largest-remainder allocation.
+
+import heapq as _heapq
+
+def _weights(weights, fptype):
+    """Return weights as a list of longs at a common precision."""
+    if isinstance(weights, FixedPointArray):
+        ws = list(weights.n)
+    else:
+        pairs = [_exactscaled(w, fptype) for w in weights]
+        p = max([wp for w, wp in pairs] or [0])
+        ws = [w * _tento(p - wp) for w, wp in pairs]
+    for w in ws:
+        if w < 0:
+            raise ValueError("allocation weights must be >= 0")
+    if not sum(ws):
+        raise ValueError("allocation weights must not all be 0")
+    return ws
+
+def _allocate(n, ws):
+    """Return longs proportional to the weights ws summing to n, by the
+       largest-remainder method."""
+    if n < 0:
+        return [-part for part in _allocate(-n, ws)]
+    total = sum(ws, 0L)
+    parts, remainders = [], []
+    for w in ws:
+        q, r = divmod(n * w, total)
+        parts.append(q)
+        remainders.append(r)
+    left = n - sum(parts, 0L)
+    # left < len(ws) units go to the largest remainders; nlargest is stable
+    for i in _heapq.nlargest(left, range(len(ws)), remainders.__getitem__):
+        parts[i] += 1
+    return parts
+
+def allocate_many(amounts, weights, asarray=0):
+    """Return [x.allocate(weights, asarray) for x in amounts], scaling the
+       weights only once."""
+    result = []
+    ws = None
+    for x in amounts:
+        if ws is None:
+            ws = _weights(weights, type(x))
+        ns = _allocate(x.n, ws)
+        if asarray:
+            result.append(FixedPointArray.from_scaled(ns, x.p, type(x)))
+        else:
+            p, cls = x.p, type(x)
+            result.append([_mkFP(n, p, cls) for n in ns])
+    return result
+
+# Rounding to a tick size, and exact price ladders.
+
+def _checkfixed(fptype, p):
+    """Raise ValueError if fptype is a fixed_class type whose precision
+       is not p."""
+    fixed = getattr(fptype, "PRECISION", p)
+    if fixed != p:
+        raise ValueError("precision of %s is fixed at %d: %r"
+                         % (fptype.__name__, fixed, p))
+
+def quantize_to_increment(x, increment, rounding=None):
+    """Return x rounded to a multiple of increment.
+
+        x is a FixedPoint or a FixedPointArray; increment is a FixedPoint,
+        int, long or numeric string such as "0.05", taken exactly.  The
+        result has the type of x (the element type for an array) and the
+        larger of the two precisions, which must be the class precision
+        for a fixed_class type.  rounding is a rounding function or mode
+        name, and defaults to the round method of x's class.
+    """
+    if rounding is not None and _contextused:
+        # an explicit rounding beats the context's: run under a copy
+        # of the context that uses it
+        saved = _current()
+        context = saved.copy()
+        context.rounding = get_rounding(rounding)
+        _tls.context = context
+        try:
+            return quantize_to_increment(x, increment)
+        finally:
+            _tls.context = saved
+    if isinstance(x, FixedPoint):
+        fptype = type(x)
+        if rounding is None and isinstance(increment, FixedPoint) and \
+           0 < increment.p <= x.p:
+            # the common case: a tick no finer than x
+            step = abs(increment.n) * _tento(x.p - increment.p)
+            if step:
+                return _mkFP(x._roundquotient(x.n, step) * step, x.p,
+                             fptype)
+    elif isinstance(x, FixedPointArray):
+        fptype = x.fptype
+    else:
+        raise TypeError("can't quantize " + `x`)
+    step, sp = _exactscaled(increment, fptype)
+    if step == 0:
+        raise ZeroDivisionError("FixedPoint increment")
+    step = abs(step)
+    p = max(x.p, sp)
+    _checkfixed(fptype, p)
+    step = step * _tento(p - sp)
+    m = _tento(p - x.p)
+    proto = _mkFP(0L, p, fptype)
+    if rounding is not None:
+        proto = _mkFP(0L, p, fptype.with_rounding(rounding))
+    if isinstance(x, FixedPoint):
+        n = proto._roundquotient(x.n * m, step) * step
+        if p == x.p:
+            return _mkFP(n, p, fptype)
+        return fptype.from_scaled(n, p)
+    qs = _roundmany(proto)([n * m for n in x.n], step)
+    return x._new([q * step for q in qs], p)
+
+def frange(start, stop, step):
+    """Generate start, start + step, ... while short of stop, exactly.
+
+        Like range(), stop is excluded and step may be negative.  The
+        arguments are FixedPoints, ints, longs or numeric strings; the
+        values have the type of start if it is a FixedPoint (else
+        FixedPoint) and the largest of the three precisions, which must
+        be the class precision for a fixed_class type.
+    """
+    fptype = FixedPoint
+    if isinstance(start, FixedPoint):
+        fptype = type(start)
+    scaled = [_exactscaled(v, fptype) for v in (start, stop, step)]
+    p = max([vp for n, vp in scaled])
+    _checkfixed(fptype, p)
+    n, stop, step = [n * _tento(p - vp) for n, vp in scaled]
+    if step == 0:
+        raise ValueError("frange() step must not be zero")
+    while (step > 0 and n < stop) or (step < 0 and n > stop):
+        yield _mkFP(n, p, fptype)
+        n = n + step
+
+import random as _random
+
+class Stats(object):
+    """One-pass statistics over FixedPoints of any precisions.
+
+        The count and the exact sums of n and n*n are kept at the largest
+        precision seen, and each result is rounded once, to the requested
+        precision (by default that largest precision, or the precision
+        of a fixed_class fptype), by fptype's rounding.  Quantiles need
+        the values themselves: with sample=None all of them are kept and
+        quantiles are exact; with sample=k at most k are kept, as a
+        uniform random sample, and quantiles are estimates from it;
+        sample=0 keeps none.
+    """
+    __slots__ = ['count', 'p', 's1', 's2', 'lo', 'hi', 'values', 'sample',
+                 'fptype']
+
+    def __init__(self, values=(), sample=None, fptype=FixedPoint):
+        self.count = 0
+        self.p = 0
+        self.s1 = self.s2 = 0L
+        self.lo = self.hi = None
+        if sample is None or sample > 0:
+            self.values = []
+        else:
+            self.values = None
+        self.sample = sample
+        self.fptype = fptype
+        self.update(values)
+
+    def _rescale(self, p):
+        """Raise the common precision to p."""
+        m = _tento(p - self.p)
+        self.s1 = self.s1 * m
+        self.s2 = self.s2 * m * m
+        if self.count:
+            self.lo = self.lo * m
+            self.hi = self.hi * m
+        if self.values:
+            self.values = [v * m for v in self.values]
+        self.p = p
+
+    def _keep(self, ns):
+        """Record the scaled values ns for quantiles."""
+        values, k = self.values, self.sample
+        if values is None:
+            return
+        if k is None or len(values) + len(ns) <= k:
+            values.extend(ns)
+            return
+        # reservoir sampling: value number i is kept with probability k/i
+        seen = self.count - len(ns)
+        randrange = _random.randrange
+        for n in ns:
+            seen += 1
+            if len(values) < k:
+                values.append(n)
+            else:
+                j = randrange(seen)
+                if j < k:
+                    values[j] = n
+
+    def add(self, value):
+        """Add value, converted exactly as by Accumulator.add."""
+        n, p = _exactscaled(value, self.fptype)
+        if p > self.p:
+            self._rescale(p)
+        elif p < self.p:
+            n = n * _tento(self.p - p)
+        self.count += 1
+        self.s1 += n
+        self.s2 += n * n
+        if self.count == 1:
+            self.lo = self.hi = n
+        elif n < self.lo:
+            self.lo = n
+        elif n > self.hi:
+            self.hi = n
+        self._keep([n])
+
+    def update(self, values):
+        """Add every value in values, an iterable or a FixedPointArray."""
+        if not isinstance(values, FixedPointArray):
+            for value in values:
+                self.add(value)
+            return
+        if not len(values.n):
+            return
+        if values.p > self.p:
+            self._rescale(values.p)
+        ns = values.n
+        if values.p < self.p:
+            m = _tento(self.p - values.p)
+            ns = [n * m for n in ns]
+        lo, hi = long(min(ns)), long(max(ns))
+        if not self.count:
+            self.lo, self.hi = lo, hi
+        else:
+            self.lo, self.hi = min(self.lo, lo), max(self.hi, hi)
+        self.count += len(ns)
+        self.s1 += sum(ns, 0L)
+        self.s2 += sum(_imap(_operator.mul, ns, ns), 0L)
+        self._keep([long(n) for n in ns])
+
+    def _result(self, num, den, e, precision):
+        """Return num / den / 10**e as an fptype rounded to precision."""
+        if precision is None:
+            p = _resultprecision(self.fptype, self.p)
+        else:
+            p = _checkprecision(precision)
+        # num/den/10**e = (num*10**p / (den*10**e)) / 10**p
+        num, den = num * _tento(p), den * _tento(e)
+        if den < 0:
+            num, den = -num, -den
+        proto = _mkFP(0L, p, self.fptype)
+        return self.fptype.from_scaled(proto._roundquotient(num, den), p)
+
+    def _needs(self, k):
+        if self.count < k:
+            raise ValueError("need at least %d values, have %d"
+                             % (k, self.count))
+
+    def mean(self, precision=None):
+        """Return the arithmetic mean."""
+        self._needs(1)
+        return self._result(self.s1, self.count, self.p, precision)
+
+    def _sqdev(self):
+        """Return the sum of squared deviations from the mean, times
+           count, at precision 2*self.p."""
+        return self.count * self.s2 - self.s1 * self.s1
+
+    def variance(self, precision=None):
+        """Return the sample variance (divisor count - 1)."""
+        self._needs(2)
+        return self._result(self._sqdev(), self.count * (self.count - 1),
+                            2 * self.p, precision)
+
+    def pvariance(self, precision=None):
+        """Return the population variance (divisor count)."""
+        self._needs(1)
+        return self._result(self._sqdev(), self.count * self.count,
+                            2 * self.p, precision)
+
+    def _sqrt(self, num, den, precision):
+        """Return sqrt(num / den / 10**(2*self.p)), rounded once."""
+        if precision is None:
+            p = _resultprecision(self.fptype, self.p)
+        else:
+            p = _checkprecision(precision)
+        # want sqrt(x) with x = num * 10**(2*(p - self.p)) / den
+        e = 2 * (p - self.p)
+        if e >= 0:
+            num = num * _tento(e)
+        else:
+            den = den * _tento(-e)
+        q = _isqrt(num // den)
+        # q = floor(sqrt(x)).  Hand the rounding function a quotient q
+        # and a remainder r of divisor 4, with r == 0 iff sqrt(x) == q,
+        # and r compared to 2 as sqrt(x) - q is to 1/2.
+        if q * q * den == num:
+            r = 0
+        else:
+            r = 2 + cmp(4 * num, (2 * q + 1) ** 2 * den)
+        proto = _mkFP(0L, p, self.fptype)
+        q = _roundingof(self.fptype)(proto, 4 * q + r, 4, q, r)
+        return self.fptype.from_scaled(q, p)
+
+    def stdev(self, precision=None):
+        """Return the sample standard deviation."""
+        self._needs(2)
+        return self._sqrt(self._sqdev(), self.count * (self.count - 1),
+                          precision)
+
+    def pstdev(self, precision=None):
+        """Return the population standard deviation."""
+        self._needs(1)
+        return self._sqrt(self._sqdev(), self.count * self.count, precision)
+
+    def min(self):
+        """Return the smallest value added."""
+        self._needs(1)
+        return self._result(self.lo, 1, self.p, None)
+
+    def max(self):
+        """Return the largest value added."""
+        self._needs(1)
+        return self._result(self.hi, 1, self.p, None)
+
+    def quantiles(self, n=4, precision=None):
+        """Return the n - 1 cut points dividing the values into n groups
+           of equal probability, interpolating linearly between order
+           statistics (the "inclusive" method).
+        """
+        if self.values is None:
+            raise ValueError("quantiles need Stats(sample=None or k > 0)")
+        if n < 1:
+            raise ValueError("n must be at least 1")
+        xs = sorted(self.values)
+        if not xs:
+            raise ValueError("need at least 1 value, have 0")
+        m = len(xs) - 1
+        result = []
+        for k in range(1, n):
+            # position m*k/n = i + r/n
+            i, r = divmod(m * k, n)
+            x = xs[i] * n
+            if r:
+                x = x + r * (xs[i + 1] - xs[i])
+            result.append(self._result(x, n, self.p, precision))
+        return result
+
+    def median(self, precision=None):
+        """Return the median (exact only with sample=None)."""
+        return self.quantiles(2, precision)[0]
+
+def _isqrt(n):
+    """Return floor(sqrt(n)) for a long n >= 0."""
+    if n < 0:
+        raise ValueError("square root of negative number")
+    if n == 0:
+        return 0L
+    x = 1L << ((n.bit_length() + 1) >> 1)
+    while 1:
+        y = (x + n // x) >> 1
+        if y >= x:
+            return x
+        x = y
+
+def sort_fixed(values, reverse=0):
+    """Return a new list of the FixedPoints (or ints) in values, sorted.
+
+        Every value is rescaled once to the largest precision present and
+        the resulting longs are sorted, instead of comparing pairs through
+        _norm.  The sort is stable.  A FixedPointArray gives a new sorted
+        FixedPointArray.
+    """
+    if isinstance(values, FixedPointArray):
+        result = values.copy()
+        result.sort(reverse)
+        return result
+    values = list(values)
+    p = 0
+    for x in values:
+        if isinstance(x, FixedPoint):
+            if x.p > p:
+                p = x.p
+        elif not isinstance(x, _inttypes):
+            raise TypeError("sort_fixed needs FixedPoints or ints: " + `x`)
+    # 10**(p - xp) for each precision xp present, filled in lazily
+    scale = {p: 1}
+    keys = []
+    append = keys.append
+    for x in values:
+        if isinstance(x, FixedPoint):
+            n, xp = x.n, x.p
+        else:
+            n, xp = x, 0
+        try:
+            m = scale[xp]
+        except KeyError:
+            m = scale[xp] = _tento(p - xp)
+        append(n * m)
+    pairs = zip(keys, values)
+    pairs.sort(key=_operator.itemgetter(0), reverse=reverse)
+    return [x for k, x in pairs]
+
+def _exactscaled(value, fptype):
+    """Return n, p s.t. value == n / 10**p exactly, for a FixedPoint,
+       int, long or numeric string; anything else is converted with
+       fptype(value)."""
+    if isinstance(value, FixedPoint):
+        return value.n, value.p
+    if isinstance(value, _inttypes):
+        return value, 0
+    if isinstance(value, basestring):
+        n, p = _string2exact(value)
+        if p >= 0:
+            return n * _tento(p), 0
+        return n, -p
+    value = fptype(value)
+    return value.n, value.p
+
+class Accumulator(object):
+    """Exact running sum of FixedPoints of any precisions.
+
+        One scaled integer total is kept per precision seen, so add()
+        never creates a FixedPoint or runs _norm; value() aligns the
+        totals and materializes a single fptype.  Partial accumulators,
+        e.g. from separate files or threads, combine with merge().
+    """
+    __slots__ = ['sums', 'fptype']
+
+    def __init__(self, values=(), fptype=FixedPoint):
+        self.sums = {}
+        self.fptype = fptype
+        self.update(values)
+
+    def __repr__(self):
+        return "Accumulator(%r)" % (self.value(),)
+
+    def add(self, value):
+        """Add value -- a FixedPoint, int, long or numeric string --
+           exactly.  Anything else is converted with fptype(value).
+        """
+        n, p = _exactscaled(value, self.fptype)
+        sums = self.sums
+        sums[p] = sums.get(p, 0L) + n
+        return self
+
+    __iadd__ = add
+
+    def update(self, values):
+        """Add every value in the iterable values."""
+        sums, add = self.sums, self.add
+        for value in values:
+            if isinstance(value, FixedPoint):
+                p = value.p
+                sums[p] = sums.get(p, 0L) + value.n
+            else:
+                add(value)
+
+    def merge(self, other):
+        """Add the totals of Accumulator other into this one."""
+        sums = self.sums
+        for p, n in other.sums.items():
+            sums[p] = sums.get(p, 0L) + n
+        return self
+
+    def value(self, precision=None):
+        """Return the total as an fptype, rounded once to precision.
+
+            precision defaults to the largest precision added so far
+            (the context's precision before anything has been added).
+        """
+        sums = self.sums
+        if sums:
+            p = max(sums.keys())
+        else:
+            p = _checkprecision(None)
+        return _roundsum(sums, p, self.fptype, precision)
+
+# Streaming CSV input and output.
+
+import csv as _csv
+try:
+    from cStringIO import StringIO as _StringIO
+except ImportError:
+    from StringIO import StringIO as _StringIO
+
+def read_csv(source, columns, chunksize=1024, fptype=FixedPoint,
+             **fmtparams):
+    """Generate the rows of a CSV file with a header line, in chunks.
+
+        source is a path or an open file.  columns maps column names to
+        precisions; those columns are converted with fptype.parse_many,
+        one column of a chunk at a time.  Each chunk is a list of up to
+        chunksize dicts as produced by csv.DictReader, which also gets
+        fmtparams.  Only one chunk is held in memory at a time.
+
+        A malformed number raises ValueError naming the column and the
+        line numbers of every malformed value in its chunk.
+    """
+    if chunksize < 1:
+        raise ValueError("chunksize must be >= 1: " + `chunksize`)
+    columns = [(name, _checkprecision(p)) for name, p in columns.items()]
+    if isinstance(source, basestring):
+        f = open(source, "rb")
+    else:
+        f = source
+    try:
+        reader = _csv.DictReader(f, **fmtparams)
+        chunk, lines = [], []
+        for row in reader:
+            chunk.append(row)
+            lines.append(int(reader.line_num))
+            if len(chunk) == chunksize:
+                _convert_chunk(chunk, columns, fptype, lines)
+                yield chunk
+                chunk, lines = [], []
+        if chunk:
+            _convert_chunk(chunk, columns, fptype, lines)
+            yield chunk
+    finally:
+        if f is not source:
+            f.close()
+
+def _convert_chunk(rows, columns, fptype, lines):
+    """Replace the named columns of rows by FixedPoints, in place.
+       lines[i] is the line number on which rows[i] ends."""
+    for name, p in columns:
+        bad = []
+        values = fptype.parse_many([row.get(name) for row in rows], p, 0,
+                                   bad)
+        if bad:
+            raise ValueError("column %r: can't parse as number at lines %s"
+                             % (name, [lines[i] for i in bad]))
+        for row, value in zip(rows, values):
+            row[name] = value
+
+def write_csv(dest, rows, fieldnames=None, chunksize=1024, **fmtparams):
+    """Write rows to a CSV file.
+
+        dest is a path or an open file.  If fieldnames is given, rows are
+        dicts written under a header line by csv.DictWriter; otherwise
+        they are sequences.  FixedPoint cells are formatted from their n
+        and p directly rather than via str().  Output is gathered in a
+        buffer and written to dest every chunksize rows.  Returns the
+        number of rows written.
+    """
+    if chunksize < 1:
+        raise ValueError("chunksize must be >= 1: " + `chunksize`)
+    if isinstance(dest, basestring):
+        f = open(dest, "wb")
+    else:
+        f = dest
+    try:
+        buf = _StringIO()
+        if fieldnames is None:
+            writer = _csv.writer(buf, **fmtparams)
+        else:
+            writer = _csv.DictWriter(buf, fieldnames, **fmtparams)
+            writer.writeheader()
+        count = 0
+        chunk = []
+        for row in rows:
+            if fieldnames is None:
+                row = list(row)
+                cells = enumerate(row)
+            else:
+                row = dict(row)
+                cells = row.items()
+            for key, value in cells:
+                if isinstance(value, FixedPoint):
+                    row[key] = _fmt(value.n, value.p)
+            chunk.append(row)
+            if len(chunk) == chunksize:
+                writer.writerows(chunk)
+                count += len(chunk)
+                chunk = []
+                f.write(buf.getvalue())
+                buf.seek(0)
+                buf.truncate()
+        writer.writerows(chunk)
+        count += len(chunk)
+        f.write(buf.getvalue())
+    finally:
+        if f is not dest:
+            f.close()
+    return count
+
 def _test():
     """Unit testing framework"""
     fp = FixedPoint
@@ -19,6 +19,8 @@ __copyright__  = "Copyright (C) Python Software Foundation"
 __author__     = "Downright Software Collective"
 __version__    = 0, 1, 0
 
+import operator
+import os
 import unittest
 from fixedpoint import FixedPoint, bankersRounding, addHalfAndChop, DEFAULT_PRECISION
 
@@ -78,6 +80,61 @@ class FixedPointTest(unittest.TestCase):
         self.assertEquals(n.precision, DEFAULT_PRECISION)
         self.assertEquals(n.n, 4212)
 
+    def testStringScanner(self):
+        """plain and general strings parse to the same exact values"""
+        import fixedpoint
+        s2e = fixedpoint._string2exact
+        self.assertEquals(s2e("1234.56"), (123456, -2))
+        self.assertEquals(s2e("-0.001"), (-1, -3))
+        self.assertEquals(s2e("42"), (42, 0))
+        self.assertEquals(s2e("7."), (7, 0))
+        for s in ("1234.56", "-1234.56", "0", "-0", "007.50", "5.",
+                  "-5.", "123456789012345678901234567890.123456789"):
+            for general in (" %s " % s, "%se0" % s, "%sE+00" % s):
+                for p in (0, 2, 9):
+                    self.assertEquals(FixedPoint(s, p), FixedPoint(general, p))
+        self.assertEquals(FixedPoint("+1.5"), FixedPoint("1.5"))
+        self.assertEquals(FixedPoint(".5"), FixedPoint("0.5"))
+        for s in ("", "-", ".", "-.", "1.2.3", "--1", "1-", "+-1", "1e",
+                  "0x10", "1,000", "1 000", "\t"):
+            self.failUnlessRaises(ValueError, FixedPoint, s)
+
+    def testParseMany(self):
+        """parse a column of strings in one call"""
+        strings = ["1.25", "-0.125", "3", "7.5e-1", " 2 "]
+        expected = [FixedPoint(x, 2) for x in strings]
+        result = FixedPoint.parse_many(strings)
+        self.assertEquals(result, expected)
+        self.assertEquals([x.precision for x in result], [2] * 5)
+        result = SonOfFixedPoint.parse_many(iter(strings), 1)
+        self.assertEquals(result, [SonOfFixedPoint(x, 1) for x in strings])
+        self.assertEquals(type(result[0]), SonOfFixedPoint)
+
+        a = FixedPoint.parse_many(strings, 3, asarray=1)
+        self.assert_(isinstance(a, FixedPointArray))
+        self.assertEquals(a.tolist(), [FixedPoint(x, 3) for x in strings])
+
+        # all malformed entries are reported
+        strings = ["1", "x", "2", "", None, "3"]
+        try:
+            FixedPoint.parse_many(strings)
+        except ValueError, e:
+            self.assert_("[1, 3, 4]" in str(e))
+        else:
+            self.fail("ValueError not raised")
+        bad = []
+        result = FixedPoint.parse_many(strings, 2, 0, bad)
+        self.assertEquals(bad, [1, 3, 4])
+        self.assertEquals(result, [1, None, 2, None, None, 3])
+        bad = []
+        a = FixedPoint.parse_many(strings, 2, 1, bad)
+        self.assertEquals(bad, [1, 3, 4])
+        self.assertEquals(list(a.n), [100, 0, 200, 0, 0, 300])
+
+        Rate = fixed_class(4)
+        self.assertEquals(Rate.parse_many(["1.23456"]), [Rate("1.2346")])
+        self.failUnlessRaises(ValueError, Rate.parse_many, ["1"], 2)
+
     def testCreateFromIntOrLong(self):
         """Create a FixedPoint from an int or a  long"""
 
@@ -136,6 +193,73 @@ class FixedPointTest(unittest.TestCase):
         self.assertEquals(n.precision, DEFAULT_PRECISION)
         self.assertEquals(n.n, 4212L)
 
+    def testFloatExact(self):
+        """float conversion rounds the exact binary value once"""
+        import decimal, random
+        rnd = random.Random(18)
+        floats = [0.125, 0.375, 2.675, 1e-300, 1.5e300, 2.0 ** 70, 0.1]
+        floats += [rnd.uniform(0, 10 ** rnd.randrange(12)) for i in range(50)]
+        prevrounding = FixedPoint.round
+        try:
+            for rounding in (bankersRounding, addHalfAndChop):
+                FixedPoint.round = rounding
+                for p in (0, 2, 7, 30):
+                    for f in floats:
+                        x = FixedPoint(f, p)
+                        self.assertEquals(x,
+                            FixedPoint(str(decimal.Decimal(f)), p))
+                        self.assertEquals(FixedPoint(-f, p), -x)
+                    values = floats + [-f for f in floats] + [3, -0.0]
+                    expected = [FixedPoint(f, p) for f in values]
+                    self.assertEquals(SonOfFixedPoint.from_floats(values, p),
+                                      expected)
+                    a = FixedPoint.from_floats(values, p, asarray=1)
+                    self.assertEquals(a.tolist(), expected)
+        finally:
+            FixedPoint.round = prevrounding
+        self.assertEquals(FixedPoint(0.125).n, 12)
+        self.assertEquals(FixedPoint(-0.375).n, -38)
+        self.assertEquals(type(SonOfFixedPoint.from_floats([1.5])[0]),
+                          SonOfFixedPoint)
+        self.failUnlessRaises(OverflowError, FixedPoint, 1e300 * 1e300)
+        self.failUnlessRaises(ValueError, FixedPoint.from_floats,
+                              [1.0, (1e300 * 1e300) * 0])
+
+    def testFromScaled(self):
+        """Create a FixedPoint from a scaled long and a precision"""
+        n = FixedPoint.from_scaled(-12345, 3)
+        self.assertEquals(type(n), FixedPoint)
+        self.assertEquals(n.precision, 3)
+        self.assertEquals(n, FixedPoint("-12.345", 3))
+        self.assertEquals(type(n.n), type(1L))
+
+        n = SonOfFixedPoint.from_scaled(42)
+        self.assertEquals(type(n), SonOfFixedPoint)
+        self.assertEquals(n.precision, DEFAULT_PRECISION)
+        self.assertEquals(str(n), "0.42")
+
+        self.failUnlessRaises(TypeError, FixedPoint.from_scaled, "x", 2)
+        for n in (1.9, "125", FixedPoint(1), None):
+            self.failUnlessRaises(TypeError, FixedPoint.from_scaled, n, 2)
+            self.failUnlessRaises(TypeError, fixed_class(2).from_scaled, n)
+        self.assertEquals(type(FixedPoint.from_scaled(True, 2).n), type(1L))
+        self.failUnlessRaises(TypeError, FixedPoint.from_scaled, 1, object)
+        self.failUnlessRaises(ValueError, FixedPoint.from_scaled, 1, -1)
+
+    def testResultsSkipInit(self):
+        """operator results are built without running __init__"""
+        calls = []
+        class Counting(FixedPoint):
+            def __init__(self, value=0, precision=DEFAULT_PRECISION):
+                calls.append(value)
+                FixedPoint.__init__(self, value, precision)
+        a, b = Counting("3.33"), Counting("1.1", 1)
+        del calls[:]
+        for c in (a + b, a - b, a * b, a / b, a % b, -a, abs(a), a.copy(),
+                  1 - a, 1 / a, 4 % a, divmod(4, a)[1]):
+            self.assertEquals(type(c), Counting)
+        self.assertEquals(calls, [])
+
     def testCreateFromObject(self):
         """
         Try to create a FixedPoint from something that can't be
@@ -206,6 +330,179 @@ class FixedPointTest(unittest.TestCase):
         n = FixedPoint(1, 0);
         self.assertEquals(str(n), "1.")
         
+    def testFormatMany(self):
+        """test formatting many values at once"""
+        values = [FixedPoint(x, p) for x in ("0", "-0.05", "1234567.891",
+                                             "-1000", "999.5", "1e30")
+                  for p in (0, 1, 2, 7)]
+        self.assertEquals(format_many(values),
+                          "\n".join([str(x) for x in values]))
+        self.assertEquals(format_many(values, sep=",", width=40),
+                          ",".join([str(x).rjust(40) for x in values]))
+        self.assertEquals(format_many([]), "")
+        self.assertEquals(
+            format_many([FixedPoint("-1234567.891"), FixedPoint("123.4"),
+                         FixedPoint("1000", 0), FixedPoint("0.5", 1)],
+                        sep=" ", thousands=",", point="*"),
+            "-1,234,567*89 123*40 1,000* 0*5")
+        a = FixedPointArray(["1", "-22.5", "1234"], 1)
+        self.assertEquals(format_many(a, sep=";", thousands="'"),
+                          "1.0;-22.5;1'234.0")
+        self.assertEquals(format_many(a), "1.0\n-22.5\n1234.0")
+
+    def testHugeConversions(self):
+        """divide-and-conquer string conversions match the builtins"""
+        import fixedpoint
+        prev = fixedpoint._DC_DIGITS, fixedpoint._DC_LEAF
+        values = [3L ** 20000, 10L ** 9000, 10L ** 9000 - 1, 10L ** 4501 + 7]
+        try:
+            for digits, leaf in ((10000, 500), (10, 7)):
+                fixedpoint._DC_DIGITS, fixedpoint._DC_LEAF = digits, leaf
+                for n in values:
+                    for p in (0, 3, 5000, 20000):
+                        x = FixedPoint.from_scaled(-n, p)
+                        s = str(x)
+                        i, f = divmod(n, 10L ** p)
+                        if p:
+                            self.assertEquals(s, "-%d.%0*d" % (i, p, f))
+                        else:
+                            self.assertEquals(s, "-%d." % i)
+                        self.assertEquals(FixedPoint(s, p), x)
+                        self.assertEquals(eval(repr(x)), x)
+        finally:
+            fixedpoint._DC_DIGITS, fixedpoint._DC_LEAF = prev
+
+    def testNewtonDivision(self):
+        """Newton reciprocal division matches plain long division"""
+        import fixedpoint, random
+        rnd = random.Random(13)
+        for i in range(50):
+            d = rnd.getrandbits(rnd.randrange(1, 3000)) | 1
+            S = d.bit_length() + rnd.randrange(0, 3000)
+            self.assertEquals(fixedpoint._reciprocal(d, S), (1L << S) // d)
+        prev, prevrounding = fixedpoint.NEWTON_DIGITS, FixedPoint.round
+        try:
+            for p in (40, 700):
+                x = rnd.getrandbits(p * 4)
+                y = rnd.getrandbits(p * 3) | 1
+                for rounding in (bankersRounding, addHalfAndChop):
+                    FixedPoint.round = rounding
+                    results = []
+                    for digits in (prev, 2):
+                        fixedpoint.NEWTON_DIGITS = digits
+                        fixedpoint._reciprocals.clear()
+                        a = FixedPoint.from_scaled(x, p)
+                        b = FixedPoint.from_scaled(-y, p)
+                        c = a.copy()
+                        c.set_precision(p // 3)
+                        results.append((a * b, b * a, a / b, b / a, c,
+                                        str(-a), divmod(a, b)))
+                    self.assertEquals(results[0], results[1])
+        finally:
+            fixedpoint.NEWTON_DIGITS, FixedPoint.round = prev, prevrounding
+            fixedpoint._reciprocals.clear()
+
+    def testDivisor(self):
+        """a Divisor divides exactly as __div__ does"""
+        xs = ["3.33", "-6.67", "0.05", "-0.05", "12345.6789", "0"]
+        for d in (3, -7L, "0.3", 2.5, FixedPoint("-1.0825", 4),
+                  SonOfFixedPoint("0.7", 1), FixedPoint(10 ** 20, 0)):
+            div = FixedPoint.divisor(d)
+            for klass in (FixedPoint, SonOfFixedPoint, FrozenFixedPoint):
+                for p in (0, 2, 5):
+                    if FixedPoint(d, p) == 0:
+                        self.failUnlessRaises(ZeroDivisionError,
+                                              div, klass(1, p))
+                        continue
+                    for x in xs:
+                        x = klass(x, p)
+                        q = div.divide(x)
+                        self.assertEquals(type(q), klass)
+                        self.assertEquals((q, q.p), (x / d, (x / d).p))
+                    values = [klass(x, p) for x in xs]
+                    self.assertEquals(div.divide_many(values),
+                                      [x / d for x in values])
+                    a = FixedPointArray(xs, p, klass)
+                    self.assertEquals(div(a).tolist(), [x / d for x in a])
+                    self.assertEquals(div(a).p, (a[0] / d).p)
+        # d is coerced to the element type, as __div__ coerces it
+        Money = fixed_class(2)
+        a = FixedPointArray(["100.00", "-0.07"], None, Money)
+        div = FixedPoint.divisor(FixedPoint("1.0825", 4))
+        self.assertEquals(div(a).tolist(), [x / div.d for x in a])
+        self.assertEquals(div(a).tolist(), [Money("92.59"), Money("-0.06")])
+        self.assertEquals(div(a).p, 2)
+        div = FixedPoint.divisor(FixedPoint(0))
+        self.failUnlessRaises(ZeroDivisionError, div, FixedPoint(1))
+        self.failUnlessRaises(TypeError, FixedPoint.divisor(3).divide, 1)
+
+    def testDotAndSumprod(self):
+        """sums of products are exact until a single final rounding"""
+        import random
+        rnd = random.Random(15)
+        xs = [FixedPoint(rnd.randrange(-10 ** 6, 10 ** 6) / 1000.0, 3)
+              for i in range(40)]
+        ys = [FixedPoint(rnd.randrange(-10 ** 5, 10 ** 5) / 100.0, 2)
+              for i in range(40)]
+        exact = FixedPoint(0, 10)
+        for x, y in zip(xs, ys):
+            exact = exact + FixedPoint(x, 10) * FixedPoint(y, 10)
+        for p in (None, 0, 2, 4, 7):
+            expected = exact.copy()
+            expected.set_precision(p is None and 3 or p)
+            self.assertEquals(dot(xs, ys, p), expected)
+            self.assertEquals(dot(xs, ys, p).p, expected.p)
+            self.assertEquals(dot(ys[::-1], xs[::-1], p), expected)
+            self.assertEquals(dot(FixedPointArray(xs, 3),
+                                  FixedPointArray(ys, 2), p), expected)
+            self.assertEquals(sumprod(zip(xs, ys, [1] * 40), p), expected)
+
+        result = sumprod([(2, "0.125", SonOfFixedPoint("1.5", 1)),
+                          (FixedPoint("0.01"), 3)])
+        self.assertEquals(type(result), SonOfFixedPoint)
+        self.assertEquals(result, FixedPoint("0.33"))
+        self.assertEquals(dot([], []), 0)
+        self.assertEquals(dot([], [], 5).p, 5)
+        self.failUnlessRaises(ValueError, dot, FixedPointArray([1, 2]),
+                              FixedPointArray([1]))
+
+    def testInPlace(self):
+        """in-place operators match the binary ones and keep identity"""
+        class ValueFixedPoint(FixedPoint):
+            __slots__ = []
+            inplace = 0
+        ops = ((operator.iadd, operator.add), (operator.isub, operator.sub),
+               (operator.imul, operator.mul), (operator.idiv, operator.div))
+        for iop, op in ops:
+            for x in ("3.33", "-6.67", "0.05", "12345.6789"):
+                for other in (3, -7L, "0.125", 2.5, FixedPoint("-1.0825", 4),
+                              SonOfFixedPoint("0.7", 1)):
+                    for klass in (FixedPoint, SonOfFixedPoint):
+                        a = klass(x, 2)
+                        alias = a
+                        expected = op(klass(x, 2), other)
+                        result = iop(a, other)
+                        self.failUnless(result is alias)
+                        self.assertEquals(type(result), klass)
+                        self.assertEquals((result.n, result.p),
+                                          (expected.n, expected.p))
+                    for klass in (ValueFixedPoint, FrozenFixedPoint):
+                        a = klass(x, 2)
+                        alias = a
+                        a = iop(a, other)
+                        self.failIf(a is alias)
+                        self.assertEquals(alias, FixedPoint(x, 2))
+                        self.assertEquals(a, op(klass(x, 2), other))
+        total = FixedPoint(0)
+        total += FixedPoint("0.001", 3)
+        total += 1
+        self.assertEquals((total.n, total.p), (1001, 3))
+        one = FrozenFixedPoint(1, 2)
+        one += 1
+        self.assertEquals(FrozenFixedPoint(1, 2), 1)
+        self.failUnlessRaises(ZeroDivisionError, operator.idiv,
+                              FixedPoint(1), "0.001")
+
     def test__repr__(self):
         """test representation"""
 
@@ -313,6 +610,335 @@ class FixedPointTest(unittest.TestCase):
         # 2002-09-19 dfort -- we could test a lot more here
         hash(FixedPoint())
         
+    def testNormalize(self):
+        """test stripping trailing zeros"""
+        n = FixedPoint("1.500", 3).normalize()
+        self.assertEquals(n.precision, 1)
+        self.assertEquals(n.n, 15)
+        self.assertEquals(FixedPoint("0", 30).normalize().precision, 0)
+        self.assertEquals(FixedPoint("-42", 100).normalize().n, -42)
+        self.assertEquals(FixedPoint("4200", 3).normalize().n, 4200)
+        self.assertEquals(type(SonOfFixedPoint(1).normalize()),
+                          SonOfFixedPoint)
+        self.assertEquals(type(fixed_class(2)(1).normalize()), FixedPoint)
+
+        # compare against stripping one digit at a time
+        for digits in ("1", "7", "120", "100010", "3" * 40):
+            for zeros in range(0, 70, 3):
+                for p in (0, 1, 5, 30, 64, 100):
+                    x = FixedPoint.from_scaled(long(digits + "0" * zeros), p)
+                    n, q = x.n, x.p
+                    while q and n % 10 == 0:
+                        n, q = n / 10, q - 1
+                    y = x.normalize()
+                    self.assertEquals((y.n, y.p), (n, q))
+                    self.assertEquals(y, x)
+                    self.assertEquals(hash(y), hash(x))
+
+    def testTentoCache(self):
+        """powers of ten are cached in a bounded LRU above the table"""
+        import fixedpoint
+        _tento = fixedpoint._tento
+        prevsize = fixedpoint.TENTO_CACHE_SIZE
+        fixedpoint.TENTO_CACHE_SIZE = 4
+        fixedpoint._tentocache.clear()
+        try:
+            for n in (0, 1, 17, 64):
+                self.assertEquals(_tento(n), 10L ** n)
+            before = tento_cache_info()
+            for n in range(1000, 1010):
+                self.assertEquals(_tento(n), 10L ** n)
+            self.assertEquals(_tento(1009), 10L ** 1009)
+            info = tento_cache_info()
+            self.assertEquals(info["size"], 4)
+            self.assertEquals(info["maxsize"], 4)
+            self.assertEquals(info["misses"] - before["misses"], 10)
+            self.assertEquals(info["hits"] - before["hits"], 1)
+            self.assert_(info["evictions"] - before["evictions"] >= 6)
+
+            # concurrent use stays bounded and correct
+            import threading
+            errors = []
+            def work(start):
+                for n in range(start, start + 50):
+                    if _tento(n) != 10L ** n:
+                        errors.append(n)
+            threads = [threading.Thread(target=work, args=(100 + 7 * i,))
+                       for i in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            self.assertEquals(errors, [])
+            self.assert_(tento_cache_info()["size"] <= 4)
+        finally:
+            fixedpoint.TENTO_CACHE_SIZE = prevsize
+
+    def testConversionCache(self):
+        """repeated string and float conversions hit a bounded cache"""
+        import fixedpoint
+        values = ["101.25", "0.125", "-1.5e-3", 0.1, 2.675, "7"]
+        expected = [(FixedPoint(v, p).n, p) for v in values for p in (2, 8)]
+        prevsize = fixedpoint.CONVERSION_CACHE_SIZE
+        prevrounding = FixedPoint.round
+        fixedpoint.CONVERSION_CACHE_SIZE = 100
+        fixedpoint._convcache.clear()
+        try:
+            before = conversion_cache_info()
+            for i in range(3):
+                result = []
+                for v in values:
+                    for p in (2, 8):
+                        x = FixedPoint(v, p)
+                        result.append((x.n, x.p))
+                        x.set_precision(0)
+                self.assertEquals(result, expected)
+            info = conversion_cache_info()
+            self.assertEquals(info["misses"] - before["misses"], 12)
+            self.assertEquals(info["hits"] - before["hits"], 24)
+            self.assertEquals(info["maxsize"], 100)
+
+            # results depend on the class and its rounding
+            self.assertEquals(FixedPoint("0.125").n, 12)
+            self.assertEquals(type(SonOfFixedPoint("0.125")),
+                              SonOfFixedPoint)
+            FixedPoint.round = addHalfAndChop
+            self.assertEquals(FixedPoint("0.125").n, 13)
+            FixedPoint.round = prevrounding
+
+            # frozen objects are shared
+            f = FrozenFixedPoint("101.25")
+            self.failUnless(FrozenFixedPoint("101.25") is f)
+            self.failIf(FrozenFixedPoint("101.25", 3) is f)
+            self.assertEquals(FrozenFixedPoint(0.1, 8), FixedPoint(0.1, 8))
+
+            fixedpoint.CONVERSION_CACHE_SIZE = 8
+            for i in range(20):
+                FixedPoint(str(i))
+            info = conversion_cache_info()
+            self.assert_(info["size"] <= 8)
+            self.assert_(info["evictions"] > before["evictions"])
+            self.assertEquals(FixedPoint("19").n, 1900)
+            self.failUnlessRaises(ValueError, FixedPoint, "1.2.3")
+        finally:
+            fixedpoint.CONVERSION_CACHE_SIZE = prevsize
+            FixedPoint.round = prevrounding
+            fixedpoint._convcache.clear()
+
+    def testSortFixed(self):
+        """sort_fixed and sort_key order like cmp across precisions"""
+        import random
+        rnd = random.Random(20)
+        values = [FixedPoint(rnd.uniform(-100, 100), rnd.randrange(6))
+                  for i in range(300)]
+        values += [FixedPoint("1.50", 2), FixedPoint("1.5", 1), 2, -3L,
+                   SonOfFixedPoint("-0.05", 2), FrozenFixedPoint("0.5", 4),
+                   FixedPoint(0, 7), FixedPoint("-2.999", 3)]
+        expected = sorted(values)
+        result = sort_fixed(values)
+        self.assertEquals(map(id, result), map(id, expected))
+        self.assertEquals(map(id, sort_fixed(values, reverse=1)),
+                          map(id, sorted(values, reverse=1)))
+
+        fps = [x for x in values if isinstance(x, FixedPoint)]
+        self.assertEquals(map(id, sorted(fps, key=FixedPoint.sort_key)),
+                          map(id, sorted(fps)))
+        self.assertEquals(FixedPoint("1.50").sort_key(),
+                          FixedPoint("1.5", 5).sort_key())
+        self.assertEquals(FixedPoint("-0.25").sort_key(), (-1, "75"))
+        self.assertEquals(FixedPoint(3, 2).sort_key(), (3, ""))
+        self.failUnlessRaises(TypeError, sort_fixed, [FixedPoint(1), "2"])
+
+        # only the precisions present are scaled, not every one up to p
+        import fixedpoint
+        fine = [FixedPoint(i - 5, 2) for i in range(10)]
+        fine.append(FixedPoint.from_scaled(-1, 5000))
+        evictions = fixedpoint._tentostats[2]
+        self.assertEquals(sort_fixed(fine), sorted(fine))
+        # one new power at most, for the one other precision
+        self.failUnless(fixedpoint._tentostats[2] - evictions <= 1)
+
+    def testQuantize(self):
+        """quantize_to_increment rounds to the nearest multiple"""
+        from fractions import Fraction
+        def nearest(x, inc, halfeven):
+            q, r = divmod(x, inc)
+            # ties go to even, or away from zero as in addHalfAndChop
+            tie = halfeven and q % 2 or not halfeven and q >= 0
+            if 2 * r > inc or (2 * r == inc and tie):
+                q += 1
+            return q * inc
+        xs = ["101.37", "101.375", "-101.375", "0.125", "-0.025", "7", "0"]
+        for inc in ("0.05", "0.25", 3, FixedPoint("0.125", 3), "-0.5"):
+            step = abs(Fraction(str(FixedPoint(inc, 3))))
+            for rounding, halfeven in ((None, 1), (bankersRounding, 1),
+                                       (addHalfAndChop, 0)):
+                for x in xs:
+                    x = SonOfFixedPoint(x, 3)
+                    result = quantize_to_increment(x, inc, rounding)
+                    self.assertEquals(type(result), SonOfFixedPoint)
+                    expected = nearest(Fraction(str(x)), step, halfeven)
+                    self.assertEquals(Fraction(str(result)), expected)
+                a = FixedPointArray(xs, 3)
+                self.assertEquals(quantize_to_increment(a, inc, rounding)
+                                  .tolist(),
+                                  [quantize_to_increment(x, inc, rounding)
+                                   for x in a])
+        result = quantize_to_increment(FixedPoint("1.3", 1), "0.25")
+        self.assertEquals((result.n, result.p), (125, 2))
+        prevrounding = FixedPoint.round
+        try:
+            FixedPoint.round = addHalfAndChop
+            self.assertEquals(quantize_to_increment(FixedPoint("0.5"), 1), 1)
+        finally:
+            FixedPoint.round = prevrounding
+        self.assertEquals(quantize_to_increment(FixedPoint("0.5"), 1), 0)
+        self.assertEquals(quantize_to_increment(FixedPoint("0.625", 3),
+                                                FixedPoint("0.25")),
+                          FixedPoint("0.5"))
+        self.failUnlessRaises(ZeroDivisionError, quantize_to_increment,
+                              FixedPoint(1), "0.00")
+        self.failUnlessRaises(TypeError, quantize_to_increment, 1, 1)
+        Rate = fixed_class(4)
+        x = quantize_to_increment(Rate("1.0137"), "0.005")
+        self.assertEquals((type(x), x), (Rate, FixedPoint("1.015", 3)))
+        self.failUnlessRaises(ValueError, quantize_to_increment,
+                              Rate("1.0137"), "0.00001")
+        self.failUnlessRaises(ValueError, quantize_to_increment,
+                              FixedPointArray([1], 4, Rate), "0.00001")
+
+    def testFrange(self):
+        """frange yields exact ladders"""
+        ladder = list(frange("99.5", 100, "0.25"))
+        self.assertEquals(ladder, [FixedPoint("99.5"), FixedPoint("99.75")])
+        self.assertEquals(list(frange(1, 0, "-0.3")),
+                          [1, FixedPoint("0.7"), FixedPoint("0.4"),
+                           FixedPoint("0.1")])
+        ladder = list(frange(FixedPoint(0, 0), 1, "0.001"))
+        self.assertEquals(len(ladder), 1000)
+        self.assertEquals(ladder[-1], FixedPoint("0.999", 3))
+        self.assertEquals(ladder[-1].p, 3)
+        ladder = list(frange(SonOfFixedPoint(1), 2, "0.5"))
+        self.assertEquals(map(type, ladder), [SonOfFixedPoint] * 2)
+        self.assertEquals(list(frange(0, 1, -1)), [])
+        self.failUnlessRaises(ValueError, list, frange(0, 1, "0.0"))
+        Rate = fixed_class(4)
+        ladder = list(frange(Rate(1), 2, "0.25"))
+        self.assertEquals([(type(x), x.p) for x in ladder], [(Rate, 4)] * 4)
+        self.assertEquals(ladder[1] + Rate(0), FixedPoint("1.25"))
+        self.failUnlessRaises(ValueError, list, frange(Rate(1), 2, "0.00001"))
+
+    def testAllocate(self):
+        """allocation is exact, proportional and favors large remainders"""
+        from fractions import Fraction
+        import random
+        rnd = random.Random(23)
+        for i in range(50):
+            x = SonOfFixedPoint.from_scaled(rnd.randrange(-10 ** 6, 10 ** 6),
+                                            rnd.randrange(4))
+            weights = [rnd.choice((rnd.randrange(100), "0.5",
+                                   FixedPoint(rnd.randrange(1, 99), 3)))
+                       for j in range(rnd.randrange(1, 12))]
+            parts = x.allocate(weights)
+            self.assertEquals(map(type, parts),
+                              [SonOfFixedPoint] * len(weights))
+            self.assertEquals([y.p for y in parts], [x.p] * len(weights))
+            self.assertEquals(sum([y.n for y in parts]), x.n)
+            ws = [Fraction(str(FixedPoint(w, 3))) for w in weights]
+            for y, w in zip(parts, ws):
+                share = abs(x.n) * w / sum(ws)
+                self.failUnless(0 <= abs(y.n) - int(share) <= 1)
+            self.assertEquals(x.allocate(weights, asarray=1).tolist(), parts)
+
+        parts = FixedPoint("100.00").allocate([1, 1, 1])
+        self.assertEquals(parts, map(FixedPoint, ["33.34", "33.33", "33.33"]))
+        parts = FixedPoint("-0.05").allocate([FixedPoint("0.3"), 0, "0.7"])
+        self.assertEquals(parts, [FixedPoint("-0.02"), 0, FixedPoint("-0.03")])
+        parts = FixedPoint("1.00").allocate(FixedPointArray([1, 2, 3], 0))
+        self.assertEquals(parts, map(FixedPoint, ["0.17", "0.33", "0.50"]))
+        self.assertEquals(allocate_many([FixedPoint(1), FixedPoint("0.02")],
+                                        [1, 2]),
+                          [FixedPoint(1).allocate([1, 2]),
+                           [FixedPoint("0.01"), FixedPoint("0.01")]])
+        self.failUnlessRaises(ValueError, FixedPoint(1).allocate, [0, 0])
+        self.failUnlessRaises(ValueError, FixedPoint(1).allocate, [1, -1])
+        self.failUnlessRaises(ValueError, FixedPoint(1).allocate, [])
+
+    def testRoundingModes(self):
+        """every rounding mode matches the decimal module"""
+        import decimal, random
+        import fixedpoint
+        rnd = random.Random(24)
+        modes = ("ROUND_FLOOR", "ROUND_CEILING", "ROUND_DOWN", "ROUND_UP",
+                 "ROUND_HALF_UP", "ROUND_HALF_DOWN", "ROUND_HALF_EVEN",
+                 "ROUND_05UP")
+        ns = [rnd.randrange(-10 ** 6, 10 ** 6) for i in range(200)]
+        ns += range(-60, 61, 5) + [10 ** 30 + 500, -10 ** 30 - 500]
+        floats = [n / 1000.0 for n in ns[:50]] + [-0.001, -1.999, -2.5,
+                                                   -0.125, 0.125, -0.0]
+        for mode in modes:
+            self.assertEquals(getattr(fixedpoint, mode), mode)
+            klass = FixedPoint.with_rounding(mode)
+            self.failUnless(FixedPoint.with_rounding(mode) is klass)
+            for p in (0, 1, 2):
+                exp = decimal.Decimal(1).scaleb(-p)
+                ctx = decimal.Context(prec=60,
+                                      rounding=getattr(decimal, mode))
+                expected = [decimal.Decimal(n).scaleb(-3, ctx).quantize(
+                                exp, context=ctx)
+                            for n in ns]
+                expected = [FixedPoint(str(x), p) for x in expected]
+                xs = [FixedPoint.from_scaled(n, 3) for n in ns]
+                self.assertEquals([x.quantize(p, mode) for x in xs],
+                                  expected)
+                self.assertEquals([klass(x, p) for x in xs], expected)
+                a = FixedPointArray(xs, 3, klass)
+                a.set_precision(p)
+                self.assertEquals(a.tolist(), expected)
+                a = quantize_to_increment(FixedPointArray(xs, 3), str(exp),
+                                          mode)
+                self.assertEquals(a.tolist(), expected)
+                # floats round their exact signed value
+                expected = [FixedPoint(str(decimal.Decimal(f).quantize(
+                                exp, context=ctx)), p) for f in floats]
+                self.assertEquals([klass(f, p) for f in floats], expected)
+                self.assertEquals(klass.from_floats(floats, p), expected)
+                with localcontext(rounding=mode):
+                    self.assertEquals([FixedPoint(f, p) for f in floats],
+                                      expected)
+        self.failUnless(FixedPoint.round.im_func is bankersRounding)
+
+        Up = FixedPoint.with_rounding(ROUND_UP)
+        self.failUnless(FixedPoint.with_rounding(bankersRounding) is
+                        FixedPoint)
+        x = Up(1) / 3
+        self.assertEquals((type(x), x), (Up, FixedPoint("0.34")))
+        self.assertEquals(type(x * FixedPoint("0.5")), Up)
+        self.assertEquals(x * FixedPoint("-0.5"), FixedPoint("-0.17"))
+        self.assertEquals(FixedPoint(1) / 3, FixedPoint("0.33"))
+        a = FixedPointArray(["0.01", "-0.01"], 2, Up) * FixedPoint("0.5")
+        self.assertEquals(list(a.n), [1, -1])
+        Money = fixed_class(2, ROUND_FLOOR, "Money")
+        self.assertEquals(Money(1) / 3 * -1, Money("-0.33"))
+        self.assertEquals(Money(-1) / 3, Money("-0.34"))
+        self.assertEquals(Money.with_rounding(ROUND_CEILING)(1) / 3,
+                          FixedPoint("0.34"))
+
+        def roundNever(self, dividend, divisor, quotient, remainder):
+            if remainder:
+                raise ValueError("inexact")
+            return quotient
+        register_rounding("ROUND_EXACT", roundNever)
+        self.failUnless(get_rounding("ROUND_EXACT") is roundNever)
+        Exact = FixedPoint.with_rounding("ROUND_EXACT")
+        self.assertEquals(Exact(1) / 4, FixedPoint("0.25"))
+        self.failUnlessRaises(ValueError, operator.div, Exact(1), 3)
+        a = FixedPointArray([1, 2], 2, Exact) * FixedPoint("0.5")
+        self.assertEquals(list(a.n), [50, 100])
+        self.failUnlessRaises(ValueError, get_rounding, "ROUND_SIDEWAYS")
+        self.failUnlessRaises(ValueError, FixedPoint(1).quantize, 0,
+                              "ROUND_SIDEWAYS")
+
     def test__nonzero__(self):
         """test the truth value"""
 
@@ -745,6 +1371,35 @@ class FixedPointTest(unittest.TestCase):
         c = b % a
         self.assertEquals(c, SonOfFixedPoint(0.01))
 
+    def testIntOperands(self):
+        """int and long operands give the same results as FixedPoints"""
+        ops = (operator.add, operator.sub, operator.mul, operator.div,
+               operator.mod, divmod, cmp)
+        prevrounding = FixedPoint.round
+        try:
+            for rounding in (bankersRounding, addHalfAndChop):
+                FixedPoint.round = rounding
+                for x in ("3.33", "-6.67", "0.05", "-0.05", "12345.6789"):
+                    for p in (0, 2, 5):
+                        a = FixedPoint(x, p)
+                        for i in (1, 3, -7, 8L, -10L ** 20):
+                            b = FixedPoint(i, p)
+                            for op in ops:
+                                self.assertEquals(op(a, i), op(a, b))
+                                if a:
+                                    self.assertEquals(op(i, a), op(b, a))
+                        self.assertEquals(type(a * 3), FixedPoint)
+                        self.assertEquals((a * 3).precision, p)
+        finally:
+            FixedPoint.round = prevrounding
+        self.failUnlessRaises(ZeroDivisionError, operator.div,
+                              FixedPoint(1), 0)
+        self.failUnlessRaises(ZeroDivisionError, divmod, FixedPoint(1), 0)
+        self.failUnlessRaises(ZeroDivisionError, operator.div,
+                              1, FixedPoint(0))
+        self.assertEquals(type(SonOfFixedPoint(2) - 1), SonOfFixedPoint)
+        self.assertEquals(type(1 / SonOfFixedPoint(2)), SonOfFixedPoint)
+
     def test__float__(self):
         """test casting to float"""
         self.assertEquals(float(4), float(FixedPoint(4)))
@@ -851,6 +1506,601 @@ class FixedPointTest(unittest.TestCase):
         
         
 
+class FixedClassTest(unittest.TestCase):
+    """Unit tests for fixed_class"""
+
+    def testCreate(self):
+        """instances always carry the class precision"""
+        Money = fixed_class(2)
+        self.assert_(Money is fixed_class(2))
+        self.assert_(issubclass(Money, FixedPoint))
+        self.assertEquals(Money.PRECISION, 2)
+        for value in (3, 3L, "3.005", 3.005, FixedPoint("3.005", 3),
+                      Money(3)):
+            m = Money(value)
+            self.assertEquals(type(m), Money)
+            self.assertEquals(m.precision, 2)
+            self.assertEquals(m, FixedPoint(value, 2))
+        self.assertEquals(repr(Money("1.5")), "FixedPoint2('1.50')")
+        self.assertEquals(FixedPoint(Money("1.25"), 1).n, 12)
+        self.assertEquals(Money.from_scaled(125), FixedPoint("1.25"))
+
+        m = Money()
+        m.set_precision(2)
+        self.failUnlessRaises(ValueError, m.set_precision, 3)
+        self.failUnlessRaises(ValueError, setattr, m, "precision", 3)
+        self.failUnlessRaises(ValueError, Money, 1, 3)
+        self.failUnlessRaises(ValueError, Money.from_scaled, 1, 3)
+        xs = Money.from_floats([1.5, -0.125])
+        self.assertEquals([(type(x), x.p) for x in xs], [(Money, 2)] * 2)
+        self.assertEquals(xs, [FixedPoint("1.50"), FixedPoint("-0.12")])
+        self.assertEquals(xs[0] + Money(1), FixedPoint("2.50"))
+        self.assertEquals(Money.from_floats([1.5], asarray=1).p, 2)
+        self.failUnlessRaises(ValueError, Money.from_floats, [1.5], 3)
+        self.failUnlessRaises(ValueError, fixed_class, -1)
+
+    def testArithmetic(self):
+        """same-class arithmetic matches FixedPoint"""
+        Rate = fixed_class(4, name="Rate")
+        xs = ("1.2345", "-0.0001", "7", "-3.3333")
+        for x in xs:
+            for y in xs:
+                a, b = FixedPoint(x, 4), FixedPoint(y, 4)
+                ra, rb = Rate(x), Rate(y)
+                for op in (operator.add, operator.sub, operator.mul,
+                           operator.div, operator.mod, divmod, cmp):
+                    self.assertEquals(op(ra, rb), op(a, b))
+                self.assertEquals(type(ra * rb), Rate)
+                self.assertEquals((ra - rb).precision, 4)
+
+        # other operands are coerced to the class precision
+        Money = fixed_class(2)
+        c = Money("1.00") + FixedPoint("0.125", 3)
+        self.assertEquals(type(c), Money)
+        self.assertEquals(c, FixedPoint("1.12"))
+        c = FixedPoint("0.125", 3) + Money("1.00")
+        self.assertEquals(type(c), Money)
+        self.assertEquals(c.precision, 2)
+        self.assertEquals(type(Money(1) + Rate(1)), Money)
+
+    def testDefaultPrecision(self):
+        """a precision of None means the class precision"""
+        Money, Rate = fixed_class(2), fixed_class(4)
+        self.assertEquals(Money("1.255", None), FixedPoint("1.26"))
+        self.assertEquals(Money.from_scaled(125, None).p, 2)
+        a = FixedPointArray(["1.25"], fptype=Money)
+        self.assertEquals((a.p, type(a[0])), (2, Money))
+        self.assertEquals(FixedPointArray.from_scaled([15], None, Rate)[0]
+                          + Rate(1), Rate("1.0015"))
+        self.failUnlessRaises(ValueError, FixedPointArray.from_scaled,
+                              [15], 1, Rate)
+        st = Stats(["1.5", "2.125"], fptype=Money)
+        for x in (st.mean(), st.stdev(), st.min(), st.max(), st.median()):
+            self.assertEquals((type(x), x.p), (Money, 2))
+        self.assertEquals(st.mean(), FixedPoint("1.81"))
+        self.assertEquals(repr(dot([Money(1)], [FixedPoint("1.2345", 4)])),
+                          "FixedPoint2('1.23')")
+        self.assertEquals(Accumulator(["1.125"], fptype=Money).value(),
+                          FixedPoint("1.12"))
+
+        # a stray instance at another precision is still combined right
+        odd = Rate.from_scaled(1)
+        odd.n, odd.p = 15L, 1
+        for op in (operator.add, operator.sub, operator.mul, operator.div,
+                   operator.mod, cmp):
+            self.assertEquals(op(odd, Rate(1)), op(FixedPoint("1.5", 4),
+                                                   FixedPoint(1, 4)))
+        self.assertEquals(Rate(odd).p, 4)
+
+    def testRounding(self):
+        """the rounding argument becomes the class's round method"""
+        Even = fixed_class(0, bankersRounding)
+        Up = fixed_class(0, addHalfAndChop)
+        self.assert_(Even is not Up)
+        self.assertEquals(Even("2.5"), 2)
+        self.assertEquals(Up("2.5"), 3)
+        self.assertEquals(Even(5) / Even(2), 2)
+        self.assertEquals(Up(5) / Up(2), 3)
+
+class FrozenFixedPointTest(unittest.TestCase):
+    """Unit tests for FrozenFixedPoint"""
+
+    def testImmutable(self):
+        """set_precision is refused, copies are the object itself"""
+        import copy
+        f = FrozenFixedPoint("1.25")
+        self.assertEquals(f.precision, DEFAULT_PRECISION)
+        self.failUnlessRaises(TypeError, f.set_precision, 3)
+        self.failUnlessRaises(TypeError, setattr, f, "precision", 3)
+        self.assert_(f.copy() is f)
+        self.assert_(copy.copy(f) is f)
+        self.assert_(copy.deepcopy(f) is f)
+        self.assertEquals(repr(f), "FrozenFixedPoint('1.25', 2)")
+        self.assertEquals(type(f + 1), FrozenFixedPoint)
+        self.assertEquals(type(f * FixedPoint(3)), FrozenFixedPoint)
+        self.assertEquals(FrozenFixedPoint(FixedPoint("1.254", 3)), f)
+        self.assertEquals(FrozenFixedPoint(1.5), FixedPoint("1.5"))
+
+        # the slots can't be written, so shared instances stay intact
+        one = FrozenFixedPoint(1)
+        h = hash(f)
+        for name in ("n", "p", "_hash", "_reduced"):
+            self.failUnlessRaises(TypeError, setattr, one, name, 5)
+            self.failUnlessRaises(TypeError, setattr, f, name, 5)
+            self.failUnlessRaises(TypeError, delattr, f, name)
+        self.assertEquals((one.n, one.p), (100, 2))
+        self.assertEquals(FrozenFixedPoint(1), 1)
+        self.assertEquals(hash(f), h)
+        import pickle
+        for proto in range(pickle.HIGHEST_PROTOCOL + 1):
+            for x in (f, one, FrozenFixedPoint("-0.001", 5)):
+                y = pickle.loads(pickle.dumps(x, proto))
+                self.assertEquals((type(y), y.n, y.p),
+                                  (FrozenFixedPoint, x.n, x.p))
+                self.assertEquals(hash(y), hash(x))
+                self.failUnlessRaises(TypeError, setattr, y, "n", 5)
+            d = pickle.loads(pickle.dumps({f: 1}, proto))
+            self.assertEquals(d[FixedPoint("1.25")], 1)
+        f += 1
+        self.assertEquals(f, FixedPoint("2.25"))
+        self.assertEquals(FrozenFixedPoint("1.25"), FixedPoint("1.25"))
+        Up = FrozenFixedPoint.with_rounding(ROUND_UP)
+        x = Up("1.001")
+        self.assertEquals((type(x), x), (Up, FixedPoint("1.01")))
+        self.failUnlessRaises(TypeError, setattr, x, "n", 5)
+        class Half(object):
+            def __float__(self):
+                return 0.5
+        x = FrozenFixedPoint(Half(), 0)
+        self.assertEquals((type(x), x), (FrozenFixedPoint, 0))
+        self.failUnlessRaises(TypeError, setattr, x, "n", 5)
+
+    def testInterned(self):
+        """common small values are shared"""
+        self.assert_(FrozenFixedPoint(1) is FrozenFixedPoint(1L, 2))
+        self.assert_(FrozenFixedPoint(0, 8) is FrozenFixedPoint(0L, 8))
+        self.assert_(FrozenFixedPoint() is FrozenFixedPoint(0))
+        self.assert_(FrozenFixedPoint(-1, 0) is FrozenFixedPoint(-1, 0))
+        self.assertEquals(FrozenFixedPoint(-1, 5), -1)
+        self.assertEquals(FrozenFixedPoint(1, 5).precision, 5)
+        self.failUnlessRaises(ValueError, FrozenFixedPoint, 1, -1)
+
+    def testCompareAndHash(self):
+        """equal FixedPoints and FrozenFixedPoints are the same dict key"""
+        for value, p in (("1.10", 2), ("1.1", 5), ("-3", 0), ("0", 4),
+                         ("123456789.000000001", 30)):
+            f, x = FrozenFixedPoint(value, p), FixedPoint(value, p)
+            self.assertEquals(hash(f), hash(x))
+            self.assertEquals(hash(f), hash(f))
+            self.assertEquals(float(f), float(x))
+            self.failUnless(f == x and x == f)
+        d = {FixedPoint("2.50"): "a"}
+        self.assertEquals(d[FrozenFixedPoint("2.5", 7)], "a")
+        self.failIf(FrozenFixedPoint(1, 0) == FixedPoint("1.4", 1))
+        self.failIf(FixedPoint("1.4", 1) == FrozenFixedPoint(1, 0))
+        self.failUnless(FrozenFixedPoint(1, 0) < FixedPoint("1.4", 1))
+
+class FixedPointArrayTest(unittest.TestCase):
+    """Unit tests for FixedPointArray"""
+
+    def testCreate(self):
+        """create from mixed values, and overflow to long storage"""
+        a = FixedPointArray(["1.25", 2, 3.333, FixedPoint("4.005", 3)])
+        self.assertEquals(a.precision, DEFAULT_PRECISION)
+        self.assertEquals(list(a.n), [125, 200, 333, 400])
+        self.assertEquals(a[3], FixedPoint(4))
+        self.assertEquals(type(a[0]), FixedPoint)
+
+        a = FixedPointArray([1, 10 ** 30], 2, SonOfFixedPoint)
+        self.assertEquals(type(a.n), list)
+        self.assertEquals(type(a[1]), SonOfFixedPoint)
+        self.assertEquals(a[1], 10 ** 30)
+
+    def testArithmetic(self):
+        """elementwise arithmetic matches FixedPoint"""
+        xs = ["3.33", "-6.66", "0.05", "1000000000000000000000.01"]
+        ys = ["1.111", "-0.5", "3", "7.007"]
+        a = FixedPointArray(xs)
+        b = FixedPointArray(ys, 3)
+        for op in (operator.add, operator.sub, operator.mul, operator.div,
+                   operator.mod):
+            expected = [op(FixedPoint(x), FixedPoint(y, 3))
+                        for x, y in zip(xs, ys)]
+            result = op(a, b)
+            self.assertEquals(result.precision, 3)
+            self.assertEquals(result.tolist(), expected)
+            for scalar in (3, "-0.7", FixedPoint("2.5", 1)):
+                expected = [op(FixedPoint(x), scalar) for x in xs]
+                self.assertEquals(op(a, scalar).tolist(), expected)
+            for scalar in (3, -7L, 2.5, FixedPoint("1.5", 3)):
+                expected = [op(scalar, FixedPoint(x)) for x in xs]
+                self.assertEquals(op(scalar, a).tolist(), expected)
+
+        qs, rs = divmod(a, b)
+        for x, y, q, r in zip(xs, ys, qs, rs):
+            self.assertEquals((q, r), divmod(FixedPoint(x), FixedPoint(y, 3)))
+        qs, rs = divmod(FixedPoint("1.5", 3), a)
+        for x, q, r in zip(xs, qs, rs):
+            self.assertEquals((q, r), divmod(FixedPoint("1.5", 3),
+                                             FixedPoint(x)))
+
+        # scalars are coerced to the element type, as _norm does
+        Money = fixed_class(2)
+        m = FixedPointArray(["100.00", "-0.07"], None, Money)
+        for op in (operator.add, operator.sub, operator.mul, operator.div):
+            for scalar in (FixedPoint("1.0825", 4), FixedPoint("0.015", 3)):
+                result = op(m, scalar)
+                self.assertEquals(result.p, 2)
+                self.assertEquals(result.tolist(), [op(x, scalar) for x in m])
+                self.assertEquals(op(scalar, m).tolist(),
+                                  [op(scalar, x) for x in m])
+
+        self.failUnlessRaises(ZeroDivisionError, operator.div, a, 0)
+        self.failUnlessRaises(ValueError, operator.add, a, a[1:])
+
+    def testRounding(self):
+        """multiplication and division honor FixedPoint.round"""
+        prevrounding = FixedPoint.round
+        FixedPoint.round = addHalfAndChop
+        try:
+            a = FixedPointArray([1, 5, -5], 0) * FixedPoint("0.5", 1)
+            self.assertEquals(list(a.n), [5, 25, -25])
+            a.set_precision(0)
+            self.assertEquals(list(a.n), [1, 3, -3])
+        finally:
+            FixedPoint.round = prevrounding
+
+    def testCompareAndReduce(self):
+        """elementwise comparison and reductions"""
+        a = FixedPointArray(["1.5", "-2", "3"])
+        self.assertEquals(a < 2, [True, True, False])
+        self.assertEquals(a == FixedPointArray([1.5, 0, 3], 3),
+                          [True, False, True])
+        self.assertEquals(a.sum(), FixedPoint("2.5"))
+        self.assertEquals(a.min(), -2)
+        self.assertEquals(a.max(), 3)
+
+    def testSort(self):
+        """sorting and argsort"""
+        a = FixedPointArray(["1.5", "-2", "3", "0.25", 10 ** 20], 2)
+        self.assertEquals(a.argsort(), [1, 3, 0, 2, 4])
+        self.assertEquals(a.argsort(reverse=1), [4, 2, 0, 3, 1])
+        b = sort_fixed(a)
+        self.assertEquals(b.tolist(), sorted(a.tolist()))
+        self.assertEquals(a[0], FixedPoint("1.5"))
+        a.sort(reverse=1)
+        self.assertEquals(a.tolist(), sorted(b.tolist(), reverse=1))
+
+class AccumulatorTest(unittest.TestCase):
+    """Unit tests for Accumulator"""
+
+    def testSum(self):
+        """totals are exact across precisions and input types"""
+        values = [FixedPoint("1.25"), 3, -7L, "0.125", "-1.5e2", "2E-4",
+                  SonOfFixedPoint("0.7", 1), FrozenFixedPoint("9.99999", 5),
+                  1.5]
+        acc = Accumulator()
+        self.assertEquals(acc.value(), FixedPoint(0))
+        self.assertEquals(acc.value().p, DEFAULT_PRECISION)
+        for value in values:
+            acc.add(value)
+        exact = FixedPoint("-140.42481", 5)
+        self.assertEquals(acc.value(), exact)
+        self.assertEquals(acc.value().p, 5)
+        self.assertEquals(acc.value(2), FixedPoint("-140.42"))
+        self.assertEquals(Accumulator(values).value(), exact)
+
+        acc = Accumulator(fptype=SonOfFixedPoint)
+        acc += FixedPoint("2.5", 1)
+        acc += 1
+        self.assertEquals(type(acc.value()), SonOfFixedPoint)
+        self.assertEquals(acc.value(0), 4)
+        self.failUnlessRaises(ValueError, acc.add, "1.2.3")
+
+    def testMerge(self):
+        """partial accumulators merge into the total"""
+        xs = [FixedPoint(i, i % 4) / 7 for i in range(-50, 60)]
+        parts = [Accumulator(xs[i::3]) for i in range(3)]
+        total = Accumulator()
+        for part in parts:
+            total.merge(part)
+        self.assertEquals(total.value(), Accumulator(xs).value())
+        self.assertEquals(total.value(), sum(xs, FixedPoint(0, 3)))
+
+class StatsTest(unittest.TestCase):
+    """Unit tests for Stats"""
+
+    def setUp(self):
+        import random
+        rnd = random.Random(21)
+        self.values = [FixedPoint(rnd.uniform(-50, 150), rnd.randrange(4))
+                       for i in range(101)]
+        self.values += [3, "-0.125", "1e2"]
+        # every value is exact at precision 3
+        self.fps = [FixedPoint(x, 3) for x in self.values]
+
+    def fractions(self):
+        from fractions import Fraction
+        return [Fraction(x.n, 1000) for x in self.fps]
+
+    def rounded(self, fraction, p):
+        # round a Fraction through FixedPoint's own division
+        return FixedPoint(fraction.numerator, p) / fraction.denominator
+
+    def testMoments(self):
+        """mean, variance and stdev are exact until a single rounding"""
+        from fractions import Fraction
+        xs = self.fractions()
+        n = len(xs)
+        mean = sum(xs) / n
+        ss = sum([(x - mean) ** 2 for x in xs])
+        stats = Stats(self.values)
+        self.assertEquals((stats.count, stats.p), (n, 3))
+        for p in (None, 0, 2, 6):
+            q = p is None and 3 or p
+            self.assertEquals(stats.mean(p), self.rounded(mean, q))
+            self.assertEquals(stats.mean(p).p, q)
+            self.assertEquals(stats.variance(p), self.rounded(ss / (n - 1), q))
+            self.assertEquals(stats.pvariance(p), self.rounded(ss / n, q))
+            for sd, var in ((stats.stdev(p), ss / (n - 1)),
+                            (stats.pstdev(p), ss / n)):
+                self.assertEquals(sd.p, q)
+                half = Fraction(1, 2 * 10 ** q)
+                sd = Fraction(sd.n, 10 ** q)
+                self.failUnless((sd - half) ** 2 <= var <= (sd + half) ** 2)
+        self.assertEquals(stats.min(), min(self.fps))
+        self.assertEquals(stats.max(), max(self.fps))
+
+        self.failUnlessRaises(ValueError, Stats().mean)
+        self.failUnlessRaises(ValueError, Stats([1]).variance)
+        self.assertEquals(Stats([1]).pvariance(), 0)
+        self.assertEquals(Stats(["0.25", "0.25"], fptype=SonOfFixedPoint)
+                          .pstdev(0), 0)
+        self.assertEquals(Stats(["2.25"]).mean(), FixedPoint("2.25"))
+        self.assertEquals(Stats([0, "0.5", 1]).pstdev(0), 0)
+        # an exact half rounds by the fptype's rounding
+        self.assertEquals(Stats([0, 1]).pstdev(0), 0)
+        self.assertEquals(Stats([0, 1]).pstdev(1), FixedPoint("0.5"))
+
+    def testArrayAndPrecision(self):
+        """FixedPointArrays and rising precisions give the same result"""
+        stats = Stats(FixedPointArray(self.fps[:50], 3))
+        stats.update(self.values[50:])
+        whole = Stats(self.fps)
+        for name in ("mean", "variance", "stdev", "min", "max", "median"):
+            self.assertEquals(getattr(stats, name)(),
+                              getattr(whole, name)())
+        stats = Stats(FixedPointArray([1, 2], 0))
+        stats.update(FixedPointArray(["2.5"], 1))
+        self.assertEquals(stats.p, 1)
+        self.assertEquals(stats.mean(4), FixedPoint("1.8333", 4))
+        self.assertEquals(stats.quantiles(4, 2), [1.5, 2, FixedPoint("2.25")])
+
+    def testQuantiles(self):
+        """exact and sampled quantiles"""
+        xs = sorted(self.fractions())
+        m = len(xs) - 1
+        stats = Stats(self.values)
+        for n in (2, 4, 10):
+            cuts = stats.quantiles(n, 4)
+            self.assertEquals(len(cuts), n - 1)
+            for k, cut in zip(range(1, n), cuts):
+                i, r = divmod(m * k, n)
+                x = xs[i] + (i < m and (xs[i + 1] - xs[i]) * r / n or 0)
+                self.assertEquals(cut, self.rounded(x, 4))
+        self.assertEquals(stats.median(), stats.quantiles(2)[0])
+        self.assertEquals(Stats([5]).median(), 5)
+        self.assertEquals(Stats(range(10)).quantiles(1), [])
+
+        sampled = Stats(sample=20)
+        for i in range(1000):
+            sampled.add(i)
+        self.assertEquals(len(sampled.values), 20)
+        self.assertEquals((sampled.min(), sampled.max()), (0, 999))
+        self.failUnless(0 <= sampled.median() <= 999)
+        self.assertEquals(sampled.mean(1), FixedPoint("499.5", 1))
+        self.failUnlessRaises(ValueError, Stats([1], sample=0).median)
+
+class CsvTest(unittest.TestCase):
+    """Unit tests for read_csv and write_csv"""
+
+    def setUp(self):
+        import tempfile
+        fd, self.path = tempfile.mkstemp(".csv")
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def testRoundTrip(self):
+        """rows written by write_csv read back through read_csv"""
+        rows = [{"id": str(i), "amount": FixedPoint(i, 2) / 7,
+                 "rate": FixedPoint("-1.5", 8) * i, "note": 'a, "b"'}
+                for i in range(10)]
+        n = write_csv(self.path, rows, ["id", "amount", "rate", "note"],
+                      chunksize=3)
+        self.assertEquals(n, 10)
+        f = open(self.path, "rb")
+        lines = f.read().splitlines()
+        f.close()
+        self.assertEquals(lines[0], "id,amount,rate,note")
+        self.assertEquals(lines[2], '1,0.14,-1.50000000,"a, ""b"""')
+
+        chunks = list(read_csv(self.path, {"amount": 2, "rate": 8},
+                               chunksize=4))
+        self.assertEquals([len(c) for c in chunks], [4, 4, 2])
+        result = [row for chunk in chunks for row in chunk]
+        self.assertEquals(result, rows)
+        self.assertEquals(type(result[0]["amount"]), FixedPoint)
+        self.assertEquals(result[3]["rate"].precision, 8)
+
+        # precision may differ from the file's
+        f = open(self.path, "rb")
+        chunk = read_csv(f, {"rate": 0}, fptype=SonOfFixedPoint).next()
+        f.close()
+        self.assertEquals(chunk[1]["rate"], SonOfFixedPoint(-2, 0))
+        self.assertEquals(type(chunk[1]["rate"]), SonOfFixedPoint)
+
+    def testSequences(self):
+        """rows without fieldnames are sequences"""
+        import StringIO
+        out = StringIO.StringIO()
+        write_csv(out, [(FixedPoint("1.5"), "x"), [-3, FixedPoint(0, 0)]],
+                  delimiter=";")
+        self.assertEquals(out.getvalue(), "1.50;x\r\n-3;0.\r\n")
+
+    def testMalformed(self):
+        """malformed values are reported by line"""
+        f = open(self.path, "wb")
+        f.write("a,b\n1,2\n3,x\n5,6\n,8\n")
+        f.close()
+        chunks = read_csv(self.path, {"a": 2, "b": 2}, chunksize=3)
+        try:
+            chunks.next()
+        except ValueError, e:
+            self.assert_("'b'" in str(e) and "[3]" in str(e))
+        else:
+            self.fail("ValueError not raised")
+        chunks = read_csv(self.path, {"a": 2}, chunksize=3)
+        self.assertEquals(len(chunks.next()), 3)
+        self.failUnlessRaises(ValueError, chunks.next)
+
+class ContextTest(unittest.TestCase):
+    """Unit tests for FixedPointContext and localcontext"""
+
+    def testDefaults(self):
+        """the context supplies the default precision"""
+        context = getcontext()
+        self.assertEquals(context.precision, DEFAULT_PRECISION)
+        self.assertEquals(context.rounding, None)
+        self.assertEquals(context.max_precision, None)
+        with localcontext(precision=5) as context:
+            self.assertEquals(getcontext(), context)
+            self.assertEquals(FixedPoint("1.234567").p, 5)
+            self.assertEquals(FixedPoint(1, 2).p, 2)
+            self.assertEquals(FixedPoint.from_scaled(1).p, 5)
+            self.assertEquals(FixedPointArray([1, 2]).p, 5)
+            self.assertEquals(FrozenFixedPoint(1).p, 5)
+            self.assertEquals(Accumulator().value().p, 5)
+            x = FixedPoint(3, 1)
+            x.set_precision()
+            self.assertEquals(x.p, 5)
+        self.assertEquals(FixedPoint("1.234567").p, DEFAULT_PRECISION)
+        self.failUnlessRaises(TypeError, localcontext, precison=3)
+        self.failUnlessRaises(ValueError, localcontext, rounding="UP")
+        self.failUnlessRaises(ValueError, FixedPointContext, -1)
+
+    def testRounding(self):
+        """the context rounding overrides each class's round method"""
+        x = FixedPoint("-2.675", 3)
+        Up = FixedPoint.with_rounding(ROUND_HALF_UP)
+        with localcontext(rounding=ROUND_FLOOR):
+            self.assertEquals(x.quantize(2), FixedPoint("-2.68"))
+            self.assertEquals(FixedPoint("2.675"), FixedPoint("2.67"))
+            self.assertEquals(Up("2.675"), FixedPoint("2.67"))
+            self.assertEquals(FixedPoint(2) / 3, FixedPoint("0.66"))
+            a = FixedPointArray(["0.5", "-0.5"], 1)
+            a.set_precision(0)
+            self.assertEquals(list(a), [0, -1])
+            # an explicit rounding beats the context's
+            self.assertEquals(x.quantize(2, ROUND_CEILING),
+                              FixedPoint("-2.67"))
+            self.assertEquals(quantize_to_increment(FixedPoint("1.03"),
+                                                    "0.05", ROUND_UP),
+                              FixedPoint("1.05"))
+        self.assertEquals(x.quantize(2), FixedPoint("-2.68"))
+        self.assertEquals(FixedPoint(2) / 3, FixedPoint("0.67"))
+
+    def testMaxPrecision(self):
+        """max_precision caps the precision of arithmetic results"""
+        x, y = FixedPoint("1.23456", 5), FixedPoint("0.005", 3)
+        with localcontext(max_precision=2):
+            self.assertEquals(repr(x + y), "FixedPoint('1.24', 2)")
+            self.assertEquals(repr(x - 1), "FixedPoint('0.23', 2)")
+            self.assertEquals(repr(1 - x), "FixedPoint('-0.23', 2)")
+            self.assertEquals(repr(x * y), "FixedPoint('0.01', 2)")
+            self.assertEquals(repr(x * 3), "FixedPoint('3.70', 2)")
+            self.assertEquals(repr(x / 7), "FixedPoint('0.18', 2)")
+            self.assertEquals(repr(x / y), "FixedPoint('246.91', 2)")
+            self.assertEquals(repr(1 / x), "FixedPoint('0.81', 2)")
+            self.assertEquals((y + y).p, 2)
+            self.assertEquals(FixedPoint(1, 1) / 3, FixedPoint("0.3", 1))
+            z = FixedPoint("1.005", 3)
+            z += x
+            self.assertEquals(repr(z), "FixedPoint('2.24', 2)")
+            # classes of fixed precision keep their precision
+            Fixed4 = fixed_class(4)
+            self.assertEquals((Fixed4("1.2345") * 2).p, 4)
+        self.assertEquals((x + y).p, 5)
+
+    def testMaxPrecisionElsewhere(self):
+        """arrays, Divisor and the summing helpers honor max_precision"""
+        xs = [FixedPoint("1.23456", 5), FixedPoint("-0.005", 3),
+              FixedPoint(7, 0), FixedPoint("-2.71828", 5)]
+        ys = [FixedPoint("0.333", 3), FixedPoint("-1.5", 1),
+              FixedPoint("0.0007", 4), FixedPoint(3, 0)]
+        with localcontext(max_precision=2, rounding=ROUND_HALF_UP):
+            a, b = FixedPointArray(xs, 5), FixedPointArray(ys, 4)
+            for op in (operator.add, operator.sub, operator.mul,
+                       operator.div):
+                expected = map(op, a, b)
+                self.assertEquals(op(a, b).tolist(), expected)
+                self.assertEquals(op(a, b).p, 2)
+                self.assertEquals(op(a, 3).tolist(), [op(x, 3) for x in a])
+                self.assertEquals(op(3, a).tolist(), [op(3, x) for x in a])
+            for d in (3, FixedPoint("1.0825", 4)):
+                div = FixedPoint.divisor(d)
+                for x in xs + [FixedPoint("1", 4)]:
+                    self.assertEquals(repr(div.divide(x)), repr(x / d))
+                self.assertEquals(div.divide(a).tolist(), [x / d for x in a])
+            self.assertEquals(repr(FixedPoint.divisor(3).divide(
+                                       FixedPoint("1", 4))),
+                              "FixedPoint('0.33', 2)")
+            self.assertEquals(repr(dot(xs, ys)), "FixedPoint('-7.73', 2)")
+            self.assertEquals(dot(xs, ys, 4).p, 4)
+            self.assertEquals(sumprod([xs]).p, 2)
+            self.assertEquals(repr(Accumulator(xs).value()),
+                              "FixedPoint('5.51', 2)")
+            st = Stats(xs)
+            self.assertEquals((st.mean().p, st.stdev().p, st.min().p),
+                              (2, 2, 2))
+        self.assertEquals(FixedPoint.divisor(3).divide(FixedPoint(1, 4)).p, 4)
+
+    def testRestore(self):
+        """contexts nest and are restored on exit, even by exceptions"""
+        outer = getcontext()
+        try:
+            with localcontext(precision=3):
+                with localcontext(precision=4, rounding=ROUND_UP):
+                    self.assertEquals(getcontext().precision, 4)
+                self.assertEquals(getcontext().precision, 3)
+                self.assertEquals(getcontext().rounding, None)
+                raise KeyError
+        except KeyError:
+            pass
+        self.assert_(getcontext() is outer)
+        context = FixedPointContext(6)
+        setcontext(context)
+        try:
+            self.assertEquals(FixedPoint(1).p, 6)
+        finally:
+            setcontext(outer)
+
+    def testThreads(self):
+        """each thread has its own context"""
+        import threading
+        results = []
+        def work():
+            results.append(getcontext().precision)
+            with localcontext(precision=7):
+                results.append(FixedPoint(1).p)
+        with localcontext(precision=4):
+            t = threading.Thread(target=work)
+            t.start()
+            t.join()
+            self.assertEquals(FixedPoint(1).p, 4)
+        self.assertEquals(results, [DEFAULT_PRECISION, 7])
+
 def _make_suite():
     """
     Factory to create a test suite
@@ -860,6 +2110,13 @@ def _make_suite():
     """
     return unittest.TestSuite((
         unittest.makeSuite(FixedPointTest, "test"),
+        unittest.makeSuite(FixedClassTest, "test"),
+        unittest.makeSuite(FrozenFixedPointTest, "test"),
+        unittest.makeSuite(FixedPointArrayTest, "test"),
+        unittest.makeSuite(AccumulatorTest, "test"),
+        unittest.makeSuite(StatsTest, "test"),
+        unittest.makeSuite(CsvTest, "test"),
+        unittest.makeSuite(ContextTest, "test"),
         ))
 
 def test_main():